@@ -0,0 +1,135 @@
+import os
+import shutil
+import logging
+import itertools
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+class ArrayRef:
+    """
+    Handle to an array in an ArrayStore; holds only its key, shape and dtype.
+    """
+    def __init__(self, store, key, shape, dtype):
+        self.store = store
+        self.key = key
+        self.shape = shape
+        self.dtype = dtype
+
+    @property
+    def nbytes(self):
+        return int(np.prod(self.shape)) * np.dtype(self.dtype).itemsize
+
+    def load(self):
+        return self.store.get(self.key)
+
+    def __repr__(self):
+        return f"ArrayRef({self.key!r}, shape={self.shape}, dtype={self.dtype})"
+
+
+class ArrayStore:
+    """
+    Working-set store that spills images to .npy files and keeps a small LRU of hot arrays.
+
+    Arrays are written once to a per-session directory and read back either memory-mapped
+    (open) or as in-memory copies cached up to hot_bytes (get). Only keys, shapes and dtypes
+    stay in RAM for everything else, so memory use no longer grows with the batch size.
+    """
+    def __init__(self, directory, hot_bytes=256 * 1024 * 1024):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix="session-", dir=directory)
+        self.hot_bytes = hot_bytes
+        self._refs = {}
+        self._file_indexes = itertools.count()
+        self._hot = OrderedDict()
+        self._hot_total = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.array_store_path, config.array_store_hot_bytes)
+
+    def put(self, key, array):
+        """
+        Writes an array to disk under key, replacing any previous value, and returns its ArrayRef.
+        """
+        array = np.ascontiguousarray(array)
+        with self._lock:
+            # Always a fresh file: the old one may still be memory-mapped by a reader
+            file_index = next(self._file_indexes)
+        path = os.path.join(self.directory, f"{file_index}.npy")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+        ref = ArrayRef(self, key, array.shape, array.dtype)
+        if key in self._refs:
+            self.delete(key)
+        with self._lock:
+            self._refs[key] = (ref, file_index)
+        return ref
+
+    def ref(self, key):
+        return self._refs[key][0]
+
+    def __contains__(self, key):
+        return key in self._refs
+
+    def __len__(self):
+        return len(self._refs)
+
+    def open(self, key):
+        """
+        Returns a read-only memory map of a stored array; pages are read from disk as touched.
+        """
+        file_index = self._refs[key][1]
+        return np.load(os.path.join(self.directory, f"{file_index}.npy"), mmap_mode='r')
+
+    def get(self, key):
+        """
+        Returns a stored array in memory, from the hot cache when it was used recently.
+        """
+        with self._lock:
+            if key in self._hot:
+                self._hot.move_to_end(key)
+                return self._hot[key]
+        array = np.array(self.open(key))
+        array.flags.writeable = False
+        if array.nbytes <= self.hot_bytes:
+            with self._lock:
+                self._drop_hot(key)
+                self._hot[key] = array
+                self._hot_total += array.nbytes
+                while self._hot_total > self.hot_bytes:
+                    _, evicted = self._hot.popitem(last=False)
+                    self._hot_total -= evicted.nbytes
+        return array
+
+    def _drop_hot(self, key):
+        array = self._hot.pop(key, None)
+        if array is not None:
+            self._hot_total -= array.nbytes
+
+    def delete(self, key):
+        with self._lock:
+            self._drop_hot(key)
+            _, file_index = self._refs.pop(key)
+        try:
+            os.remove(os.path.join(self.directory, f"{file_index}.npy"))
+        except OSError as e:
+            logging.getLogger(__name__).warning(f"Could not remove stored array {key}: {e}")
+
+    def disk_bytes(self):
+        return sum(ref.nbytes for ref, _ in self._refs.values())
+
+    def close(self):
+        """
+        Drops the hot cache and deletes the session's files.
+        """
+        with self._lock:
+            self._hot.clear()
+            self._hot_total = 0
+            self._refs.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,22 @@
+"""
+Result files written so readers never see a partial file, even if the process dies mid-write:
+the data goes to a temporary file next to the target, which then replaces it in one step.
+"""
+import os
+
+
+def _replace_with(path, data, mode, **open_args):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, mode, **open_args) as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_text_atomic(path, text):
+    _replace_with(path, text, 'w', encoding='utf-8')
+
+
+def write_bytes_atomic(path, data):
+    # Binary outputs (PDF, Tesseract's own renderings) are written as produced
+    _replace_with(path, data, 'wb')
@@ -0,0 +1,181 @@
+"""
+Headless multi-format export: OCR every page in a directory once and write its text, hOCR,
+TSV and searchable PDF side by side in Config.output_path, plus a JSON-lines manifest of the
+whole batch. Multi-page TIFFs produce one <name>_pageNNNN.<ext> per page and format.
+
+Pages are streamed through the OCR process pool and each one's outputs are written and
+dropped as soon as it completes, so memory stays bounded by the pages in flight.
+
+Usage:
+    python -m batch_export INPUT_DIR [--output DIR] [--formats txt,hocr,tsv,pdf]
+                           [--rotate DEG] [--deskew] [--auto] [--workers N] ...
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import pytesseract
+from atomic_write import write_bytes_atomic
+from batch_ocr import (add_processing_arguments, build_pipeline, config_from_args,
+                       export_timings, output_path_for)
+from ocr_data import WordTable
+from ocr_engine import OCREngine, EXPORT_FORMATS
+from search_index import SearchIndex
+from scheduler import JobScheduler, JobCancelled, current_job
+import documents
+import pipeline
+import tracing
+
+
+class BatchExporter:
+    """
+    Writes the rendered outputs of each page next to each other and appends one manifest
+    line per page, flushed as it is written so an interrupted batch keeps a valid manifest.
+    """
+    def __init__(self, input_dir, output_dir, formats, manifest_name="manifest.jsonl"):
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.formats = list(formats)
+        os.makedirs(output_dir, exist_ok=True)
+        self.manifest_path = os.path.join(output_dir, manifest_name)
+        self._manifest = open(self.manifest_path, 'w', encoding='utf-8')
+        self.done = 0
+        self.failed = 0
+
+    @classmethod
+    def from_config(cls, input_dir, config):
+        return cls(input_dir, config.output_path, config.export_formats, config.export_manifest_name)
+
+    def write(self, result):
+        """
+        Stores a documents.PageResult whose text field holds process_image_formats' outputs
+        (None for a failed page) and returns the page's manifest entry.
+        """
+        entry = {
+            "document": os.path.relpath(result.document, self.input_dir),
+            "page": result.page,
+            "page_count": result.page_count,
+        }
+        if result.text is None:
+            entry["status"] = "failed"
+        else:
+            base = os.path.splitext(output_path_for(result.document, self.input_dir, self.output_dir,
+                                                    result.page, result.page_count))[0]
+            files = {}
+            for extension in self.formats:
+                path = f"{base}.{extension}"
+                write_bytes_atomic(path, result.text[extension])
+                files[extension] = os.path.relpath(path, self.output_dir)
+            entry["status"] = "done"
+            entry["outputs"] = files
+            if 'tsv' in result.text:
+                words = WordTable.from_tesseract(pytesseract.pytesseract.file_to_dict(
+                    result.text['tsv'].decode('utf-8'), '\t', -1))
+                entry["words"] = len(words)
+                entry["mean_confidence"] = words.mean_confidence()
+        self._manifest.write(json.dumps(entry) + "\n")
+        self._manifest.flush()
+        if entry["status"] == "done":
+            self.done += 1
+        else:
+            self.failed += 1
+        return entry
+
+    def close(self):
+        self._manifest.close()
+
+
+def run(args):
+    logger = logging.getLogger(__name__)
+    config = config_from_args(args)
+    if args.output:
+        config.output_path = args.output
+    if args.formats:
+        config.export_formats = args.formats.split(',')
+    unknown = [extension for extension in config.export_formats if extension not in EXPORT_FORMATS]
+    if unknown:
+        logger.error(f"Unknown output formats {unknown}, expected some of {EXPORT_FORMATS}")
+        return 2
+    ocr_engine = OCREngine(config)
+    index = SearchIndex.from_config(config) if config.search_index_path else None
+    steps = build_pipeline(args, config)
+    exporter = BatchExporter.from_config(args.input_dir, config)
+
+    image_paths = list(pipeline.iter_image_files(args.input_dir, args.recursive))
+    total = sum(1 for _ in documents.iter_page_refs(image_paths))
+
+    def export_pages():
+        job = current_job()
+        results = documents.ocr_pages(ocr_engine, image_paths, workers=args.workers,
+                                      preprocess=steps, chunk_size=args.chunk_size,
+                                      output='formats')
+        for result in results:
+            job.check_cancelled()
+            finished = exporter.done + exporter.failed + 1
+            job.report(finished / total, f"{finished}/{total} pages")
+            try:
+                with tracing.span('result'):
+                    exporter.write(result)
+                    if index is not None and result.text is not None and 'txt' in result.text:
+                        index.add(os.path.abspath(result.document), result.page,
+                                  result.text['txt'].decode('utf-8'))
+            except OSError as e:
+                logger.error(f"Could not write results for {result.document} page {result.page}: {e}")
+                exporter.failed += 1
+
+    # One job, as in batch_ocr: shared cancellation and progress only, so Ctrl-C stops after the
+    # pages in progress
+    scheduler = JobScheduler(workers=1)
+    job = scheduler.submit(export_pages, name="batch_export")
+    cancelled = False
+    while not job.finished:
+        try:
+            time.sleep(config.progress_interval_ms / 1000)
+        except KeyboardInterrupt:
+            logger.warning("Interrupted, cancelling after the pages in progress")
+            job.cancel()
+        for event in scheduler.drain():
+            if event.kind == 'progress':
+                logger.info(f"Export progress: {event.message}")
+    try:
+        job.wait()
+    except JobCancelled:
+        cancelled = True
+    finally:
+        scheduler.shutdown()
+        exporter.close()
+    logger.info(f"Export finished: {exporter.done} pages written, {exporter.failed} failed; "
+                f"manifest at {exporter.manifest_path}")
+    if index is not None:
+        index.close()
+    export_timings(config)
+    if cancelled:
+        return 130
+    return 0 if exporter.failed == 0 else 1
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="OCR a directory once and export text, hOCR, TSV and searchable PDF per page")
+    parser.add_argument("input_dir", help="Directory containing the images to process")
+    parser.add_argument("--output", default=None, help="Folder for results (default: Config.output_path)")
+    parser.add_argument("--formats", default=None,
+                        help=f"Comma-separated outputs out of {','.join(EXPORT_FORMATS)} "
+                             "(default: Config.export_formats)")
+    parser.add_argument("--recursive", action="store_true", help="Descend into subdirectories")
+    add_processing_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
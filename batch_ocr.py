@@ -0,0 +1,256 @@
+"""
+Headless batch OCR: preprocess every image in a directory and write the recognized text.
+Multi-page TIFFs are streamed page by page and produce one <name>_pageNNNN.txt per page.
+
+Usage:
+    python -m batch_ocr INPUT_DIR OUTPUT_DIR [--rotate DEG] [--deskew] [--contrast ALPHA] [--binarize]
+                        [--auto [--stages denoise,clahe,...] [--stage-report]]
+                        [--workers N] [--chunk-size N]
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+import numpy as np
+from atomic_write import write_text_atomic
+from config import Config
+from ocr_engine import OCREngine
+from ocr_data import WordTable
+from search_index import SearchIndex
+from scheduler import JobScheduler, JobCancelled, current_job
+import documents
+import pipeline
+import tracing
+
+
+def build_pipeline(args, config):
+    auto = None
+    if args.auto:
+        stages = args.stages.split(',') if args.stages else None
+        auto = pipeline.AutoPreprocessor(config, stages)
+    steps = pipeline.Pipeline(auto=auto)
+    if args.rotate:
+        steps.add('rotate', angle=args.rotate)
+    if args.deskew:
+        steps.add('deskew')
+    if args.contrast is not None:
+        steps.add('contrast', alpha=args.contrast)
+    if args.binarize:
+        steps.add('binarize')
+    return steps
+
+
+def output_path_for(image_path, input_dir, output_dir, page=0, page_count=1):
+    relative = os.path.splitext(os.path.relpath(image_path, input_dir))[0]
+    if page_count > 1:
+        relative = f"{relative}_page{page + 1:04d}"
+    return os.path.join(output_dir, relative + ".txt")
+
+
+def run(args):
+    logger = logging.getLogger(__name__)
+    config = config_from_args(args)
+    ocr_engine = OCREngine(config)
+    index = SearchIndex.from_config(config) if config.search_index_path else None
+    steps = build_pipeline(args, config)
+    output = 'words' if args.words else 'text'
+
+    image_paths = list(pipeline.iter_image_files(args.input_dir, args.recursive))
+    pages = list(documents.iter_page_refs(image_paths))
+    done = failed = 0
+    word_tables, page_documents, page_numbers = [], [], []
+
+    def process_pages():
+        nonlocal done, failed
+        job = current_job()
+        if args.stage_report:
+            # Preprocess here so the per-stage timings are collected in this process
+            reductions = {}
+
+            def images():
+                for index, ref in enumerate(pages):
+                    image, reductions[index] = documents.load_page_reduced(
+                        ref.document, ref.page, config.decode_max_dpi)
+                    yield steps.run(image)
+
+            # Word boxes of a page decoded reduced are scaled back to the file's pixels
+            results = (
+                documents.PageResult(pages[index].document, pages[index].page, pages[index].page_count, text)
+                for index, text in ocr_engine.process_batch(
+                    images(), workers=args.workers, chunk_size=args.chunk_size, output=output,
+                    box_scales=reductions)
+            )
+        else:
+            results = documents.ocr_pages(ocr_engine, image_paths, workers=args.workers,
+                                          preprocess=steps, chunk_size=args.chunk_size,
+                                          output=output)
+        for result in results:
+            job.check_cancelled()
+            job.report((done + failed + 1) / len(pages), f"{done + failed + 1}/{len(pages)} pages")
+            if result.text is None:
+                failed += 1
+                continue
+            text = result.text
+            if args.words:
+                # Number pages across the whole batch; the .npz maps them back to documents
+                word_tables.append(text.shifted(page=len(page_documents)))
+                page_documents.append(result.document)
+                page_numbers.append(result.page)
+                text = text.text()
+            try:
+                with tracing.span('result'):
+                    out_path = output_path_for(result.document, args.input_dir, args.output_dir,
+                                               result.page, result.page_count)
+                    write_text_atomic(out_path, text)
+                    if index is not None:
+                        index.add(os.path.abspath(result.document), result.page, text)
+                done += 1
+            except OSError as e:
+                logger.error(f"Could not write result for {result.document} page {result.page}: {e}")
+                failed += 1
+
+    # The batch is one job: the scheduler gives it the GUI's cancellation and progress events,
+    # while the OCR pool does the per-page work (no per-page priorities or retries)
+    scheduler = JobScheduler(workers=1)
+    job = scheduler.submit(process_pages, name="batch_ocr")
+    cancelled = False
+    while not job.finished:
+        try:
+            time.sleep(config.progress_interval_ms / 1000)
+        except KeyboardInterrupt:
+            logger.warning("Interrupted, cancelling after the pages in progress")
+            job.cancel()
+        for event in scheduler.drain():
+            if event.kind == 'progress':
+                logger.info(f"OCR progress: {event.message}")
+    try:
+        job.wait()
+    except JobCancelled:
+        cancelled = True
+    finally:
+        scheduler.shutdown()
+    if args.words:
+        WordTable.concat(word_tables).save(
+            args.words, page_documents=np.array(page_documents, dtype=str),
+            page_numbers=np.array(page_numbers, dtype=np.uint32))
+        logger.info(f"Word-level results written to {args.words}")
+    logger.info(f"Batch OCR finished: {done} processed, {failed} failed")
+    if ocr_engine.cache is not None:
+        logger.info(f"OCR cache: {ocr_engine.cache.stats()}")
+    report_resampling(ocr_engine)
+    if index is not None:
+        logger.info(f"Search index at {index.path} holds {len(index)} pages")
+        index.close()
+    export_timings(config)
+    if args.stage_report and steps.auto is not None:
+        print(steps.auto.format_report())
+    if cancelled:
+        return 130
+    return 0 if failed == 0 else 1
+
+
+def add_processing_arguments(parser):
+    """
+    Adds the preprocessing and OCR options shared by the batch and watch-folder commands.
+    """
+    parser.add_argument("--rotate", type=float, default=0.0, help="Rotation angle in degrees")
+    parser.add_argument("--deskew", action="store_true", help="Straighten skewed pages")
+    parser.add_argument("--contrast", type=float, default=None, help="Contrast gain (alpha)")
+    parser.add_argument("--binarize", action="store_true", help="Apply Otsu binarization")
+    parser.add_argument("--auto", action="store_true",
+                        help="Run the Config-driven denoise/CLAHE/threshold/deskew stages")
+    parser.add_argument("--stages", default=None,
+                        help="Comma-separated automatic stages, overriding Config.auto_preprocess_stages")
+    parser.add_argument("--regions", action="store_true",
+                        help="OCR only the text blocks found by layout analysis, skipping pictures and margins")
+    parser.add_argument("--lang", default=None, help="Tesseract language (default from Config)")
+    parser.add_argument("--psm", type=int, default=None, help="Tesseract page segmentation mode")
+    parser.add_argument("--workers", type=int, default=None, help="OCR worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="Images per Tesseract invocation, amortizing startup on small pages")
+    parser.add_argument("--no-index", action="store_true",
+                        help="Do not add results to the full-text search index")
+    parser.add_argument("--reuse-duplicates", action="store_true",
+                        help="Reuse the OCR result of an earlier near-identical page (perceptual hash)")
+    parser.add_argument("--no-cache", action="store_true", help="Always run Tesseract, bypassing the result cache")
+    parser.add_argument("--trace", default=None, metavar="PATH.jsonl",
+                        help="Append a JSON-lines event per pipeline stage to this file")
+    parser.add_argument("--metrics", default=None, metavar="PATH.prom",
+                        help="Write per-stage timing histograms in Prometheus text format")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log progress to the console")
+
+
+def config_from_args(args):
+    config = Config()
+    if args.lang:
+        config.language = args.lang
+    if args.psm is not None:
+        config.psm = args.psm
+    if args.regions:
+        config.region_ocr = True
+    if args.reuse_duplicates:
+        config.near_duplicates = True
+    if args.no_cache:
+        config.cache_path = None
+    if args.no_index:
+        config.search_index_path = None
+    if args.trace:
+        config.trace_path = args.trace
+    if args.metrics:
+        config.metrics_path = args.metrics
+    tracing.configure(config)
+    return config
+
+
+def report_resampling(ocr_engine):
+    """
+    Logs how many pixels resolution normalization kept away from Tesseract.
+    """
+    counts = ocr_engine.resampled
+    if not counts['pages']:
+        return
+    change = counts['pixels_out'] / counts['pixels_in'] - 1
+    logging.getLogger(__name__).info(
+        f"Resolution normalization resampled {counts['resampled']} of {counts['pages']} pages: "
+        f"{counts['pixels_in'] / 1e6:.1f} to {counts['pixels_out'] / 1e6:.1f} megapixels "
+        f"({abs(change):.0%} {'fewer' if change <= 0 else 'more'})")
+
+
+def export_timings(config):
+    logger = logging.getLogger(__name__)
+    tracing.tracer.flush()
+    if config.metrics_path:
+        tracing.tracer.write_prometheus(config.metrics_path)
+        logger.info(f"Stage timings written to {config.metrics_path}")
+    skipped = {stage.split('.', 1)[1]: stats[0] for stage, stats in tracing.tracer.snapshot().items()
+               if stage.startswith(('skipped.', 'reused.'))}
+    if skipped:
+        logger.info("Pages answered without OCR: "
+                    + ", ".join(f"{count} {kind}" for kind, count in sorted(skipped.items())))
+    logger.info("Stage timings:\n" + tracing.tracer.format_summary())
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run preprocessing and OCR over a directory of images")
+    parser.add_argument("input_dir", help="Directory containing the images to process")
+    parser.add_argument("output_dir", help="Directory receiving one .txt file per page")
+    parser.add_argument("--recursive", action="store_true", help="Descend into subdirectories")
+    add_processing_arguments(parser)
+    parser.add_argument("--stage-report", action="store_true",
+                        help="Preprocess in this process and print per-stage timings (with --auto)")
+    parser.add_argument("--words", default=None, metavar="PATH.npz",
+                        help="Also save word boxes, confidences and ids for the whole batch as .npz")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
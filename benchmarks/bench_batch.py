@@ -0,0 +1,50 @@
+"""
+Throughput of OCREngine.process_batch against the serial process_image loop.
+
+Usage:
+    python -m benchmarks.bench_batch [--pages 32] [--workers N] [--chunk-size 8]
+"""
+import time
+import argparse
+from config import Config
+from ocr_engine import OCREngine
+from benchmarks.synthetic import make_page
+
+
+def bench_serial(engine, pages):
+    start = time.perf_counter()
+    for page in pages:
+        engine.process_image(page)
+    return time.perf_counter() - start
+
+
+def bench_batch(engine, pages, workers, chunk_size=1):
+    start = time.perf_counter()
+    for _ in engine.process_batch(pages, workers=workers, chunk_size=chunk_size):
+        pass
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    config = Config()
+    config.cache_path = None
+    engine = OCREngine(config)
+    pages = [make_page(seed=i)[0] for i in range(args.pages)]
+
+    serial = bench_serial(engine, pages)
+    batch = bench_batch(engine, pages, args.workers)
+    chunked = bench_batch(engine, pages, args.workers, args.chunk_size)
+    print(f"serial : {serial:8.2f} s  {args.pages / serial:6.2f} pages/s")
+    print(f"batch  : {batch:8.2f} s  {args.pages / batch:6.2f} pages/s  {serial / batch:5.2f}x")
+    print(f"chunked: {chunked:8.2f} s  {args.pages / chunked:6.2f} pages/s  {serial / chunked:5.2f}x"
+          f"  ({args.chunk_size} pages per invocation)")
+
+
+if __name__ == "__main__":
+    main()
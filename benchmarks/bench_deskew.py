@@ -0,0 +1,54 @@
+"""
+Angle error and speed of the multi-scale deskew engine against the full-resolution Hough approach.
+
+Usage:
+    python -m benchmarks.bench_deskew [--pages 20] [--max-angle 10] [--scale 2]
+"""
+import time
+import argparse
+import numpy as np
+from deskew import estimate_skew, estimate_skew_hough
+from benchmarks.synthetic import make_page, rotate_page
+
+
+def measure(estimator, pages, angles):
+    errors, times = [], []
+    for page, angle in zip(pages, angles):
+        start = time.perf_counter()
+        estimate = estimator(page)
+        times.append(time.perf_counter() - start)
+        # Estimators return the correction, i.e. the negated applied rotation
+        errors.append(abs(estimate + angle))
+    return np.array(errors), np.array(times) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--max-angle", type=float, default=10.0)
+    parser.add_argument("--scale", type=int, default=2, help="Page size multiplier over 150 dpi A4")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    angles = rng.uniform(-args.max_angle, args.max_angle, args.pages)
+    pages = [
+        rotate_page(make_page(seed=args.seed + i, width=1240 * args.scale, height=1754 * args.scale,
+                              font_scale=args.scale, thickness=2 * args.scale,
+                              margin=80 * args.scale)[0], angle)
+        for i, angle in enumerate(angles)
+    ]
+
+    estimators = {
+        'hough': estimate_skew_hough,
+        'multiscale': lambda page: estimate_skew(page)[0],
+    }
+    print(f"{'method':<12}{'mean err':>10}{'p90 err':>10}{'max err':>10}{'>0.5 deg':>10}{'ms/page':>10}")
+    for name, estimator in estimators.items():
+        errors, times = measure(estimator, pages, angles)
+        print(f"{name:<12}{errors.mean():>10.3f}{np.percentile(errors, 90):>10.3f}{errors.max():>10.3f}"
+              f"{(errors > 0.5).mean():>10.0%}{times.mean():>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
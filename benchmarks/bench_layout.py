@@ -0,0 +1,70 @@
+"""
+Whole-page OCR against layout-driven region OCR on mixed pages (text around a photo).
+
+Usage:
+    python -m benchmarks.bench_layout [--pages 5] [--layout-only]
+"""
+import time
+import argparse
+import cv2
+import numpy as np
+from config import Config
+from ocr_engine import OCREngine
+from layout import detect_text_regions
+import pipeline
+from benchmarks.synthetic import make_scan
+
+
+def make_mixed_page(seed):
+    """
+    A scanned text page with a photo-like block covering part of it, as in a brochure.
+    """
+    page = pipeline.to_gray(make_scan(seed=seed, dpi=300)[0]).copy()
+    rng = np.random.default_rng(seed)
+    h, w = page.shape
+    top, left = int(h * rng.uniform(0.2, 0.5)), int(w * rng.uniform(0.1, 0.3))
+    bottom, right = top + h // 3, min(w - 50, left + w // 2)
+    photo = cv2.GaussianBlur(rng.integers(0, 255, (bottom - top, right - left), dtype=np.uint8), (0, 0), 6)
+    page[top:bottom, left:right] = cv2.normalize(photo, None, 0, 200, cv2.NORM_MINMAX)
+    return page
+
+
+def time_per_page(fn, pages):
+    times = []
+    for page in pages:
+        start = time.perf_counter()
+        fn(page)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--layout-only", action="store_true",
+                        help="Only time layout analysis, without running Tesseract")
+    args = parser.parse_args(argv)
+
+    pages = [make_mixed_page(seed) for seed in range(args.pages)]
+    regions = [detect_text_regions(page) for page in pages]
+    coverage = np.mean([sum((r.right - r.left) * (r.bottom - r.top) for r in page_regions) / page.size
+                        for page, page_regions in zip(pages, regions)])
+    analysis = time_per_page(detect_text_regions, pages)
+    print(f"layout analysis {analysis:8.2f} ms/page   {np.mean([len(r) for r in regions]):.1f} regions "
+          f"covering {coverage:.0%} of the page")
+    if args.layout_only:
+        return
+
+    results = {}
+    for region_ocr in (False, True):
+        config = Config()
+        config.cache_path = None
+        config.region_ocr = region_ocr
+        engine = OCREngine(config)
+        results[region_ocr] = time_per_page(engine.process_image, pages)
+    print(f"whole page {results[False]:8.2f} ms/page   regions {results[True]:8.2f} ms/page   "
+          f"saved {results[False] - results[True]:8.2f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Indexing throughput and query latency of search_index.SearchIndex on synthetic pages.
+
+Usage:
+    python -m benchmarks.bench_search [--pages 100000] [--index PATH]
+
+Page text is drawn from a Zipf-distributed vocabulary, so queries cover both terms found on
+nearly every page and terms found on a handful.
+"""
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+from search_index import SearchIndex
+from benchmarks.synthetic import WORDS
+
+
+def make_vocabulary(rng, size=50000):
+    # Real words first so the most frequent terms are readable in queries
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    made_up = {"".join(rng.choice(letters, size=rng.integers(4, 10))) for _ in range(size)}
+    vocabulary = np.array(WORDS + sorted(made_up - set(WORDS)))
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1)
+    return vocabulary, weights / weights.sum()
+
+
+def build(index, pages, words_per_page=300, batch=1000):
+    rng = np.random.default_rng(0)
+    vocabulary, probabilities = make_vocabulary(rng)
+    start = time.perf_counter()
+    for first in range(0, pages, batch):
+        count = min(pages, first + batch) - first
+        words = rng.choice(vocabulary, size=(count, words_per_page), p=probabilities)
+        index.add_many((f"doc{i // 10:06d}.tif", i % 10, " ".join(words[i - first]))
+                       for i in range(first, first + count))
+    index.optimize()
+    return time.perf_counter() - start, vocabulary
+
+
+def time_query(index, query, ranked, repeat=10):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hits = index.search(query, limit=20, ranked=ranked)
+        times.append(time.perf_counter() - start)
+    return len(hits), float(np.median(times)) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=100000)
+    parser.add_argument("--index", default=None, help="Index file, a temporary one by default")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SearchIndex(args.index or os.path.join(tmp, "bench_index.sqlite3"))
+        elapsed, vocabulary = build(index, args.pages)
+        print(f"indexed {args.pages} pages in {elapsed:.1f}s ({args.pages / elapsed:.0f} pages/s)")
+        rare = vocabulary[5000]
+        queries = ['the', 'total amount', f'"{vocabulary[1]} {vocabulary[2]}"', 'ship*',
+                   rare, f'{rare[:4]}*', f'{rare} the']
+        print(f"{'query':28s} {'ranked':>16s} {'unranked':>16s}")
+        for query in queries:
+            hits, ranked_ms = time_query(index, query, ranked=True)
+            _, unranked_ms = time_query(index, query, ranked=False)
+            print(f"{query:28s} {hits:3d} hits {ranked_ms:7.2f} ms {unranked_ms:13.2f} ms")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Per-page cost of handing an image to Tesseract: pytesseract temp files against raw PNM over stdin.
+
+Usage:
+    python -m benchmarks.bench_transport [--pages 20] [--encode-only]
+"""
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+from PIL import Image
+from config import Config
+from ocr_engine import OCREngine, encode_pnm
+from benchmarks.synthetic import make_page
+
+
+def encode_temp_png(page, tmp_dir):
+    # What pytesseract does per call: encode a PNG, write it, and Tesseract reads it back
+    path = os.path.join(tmp_dir, "input.png")
+    Image.fromarray(page).save(path)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def time_per_page(fn, pages):
+    times = []
+    for page in pages:
+        start = time.perf_counter()
+        fn(page)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--encode-only", action="store_true",
+                        help="Only time the image hand-off, without running Tesseract")
+    args = parser.parse_args(argv)
+
+    pages = [make_page(seed=i)[0] for i in range(args.pages)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        png = time_per_page(lambda page: encode_temp_png(page, tmp_dir), pages)
+    pnm = time_per_page(encode_pnm, pages)
+    print(f"hand-off   temp PNG {png:8.2f} ms/page   PNM bytes {pnm:8.2f} ms/page   "
+          f"saved {png - pnm:8.2f} ms/page")
+    if args.encode_only:
+        return
+
+    results = {}
+    for transport in ('file', 'pipe'):
+        config = Config()
+        config.cache_path = None
+        config.tesseract_transport = transport
+        engine = OCREngine(config)
+        results[transport] = time_per_page(engine.process_image, pages)
+    print(f"end-to-end file     {results['file']:8.2f} ms/page   pipe      {results['pipe']:8.2f} ms/page   "
+          f"saved {results['file'] - results['pipe']:8.2f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
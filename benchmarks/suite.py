@@ -0,0 +1,217 @@
+"""
+Offline benchmark suite: synthetic scans through preprocessing and OCR, compared with a baseline.
+
+Usage:
+    python -m benchmarks.suite [--pages 5] [--scenarios clean,skewed] [--save-baseline]
+                               [--baseline benchmarks/baseline.json] [--tolerance 0.15]
+
+Each scenario renders reproducible pages with known text (benchmarks.synthetic.make_scan),
+runs the ImagePreprocessor operations through pipeline.Pipeline and OCREngine.process_image
+on them, and reports pages/sec, p50/p99 latency per stage, peak RSS and character error rate.
+With --save-baseline the results are written to the baseline file; otherwise they are
+compared with it and the exit status is 1 when throughput, latency or CER regressed by more
+than the tolerance.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import numpy as np
+import cv2
+from config import Config
+from ocr_engine import OCREngine
+import pipeline
+from benchmarks.synthetic import make_scan
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+SCENARIOS = {
+    'clean': dict(dpi=300),
+    'skewed': dict(dpi=300, skew=4.0),
+    'noisy': dict(dpi=300, noise=25.0),
+    'blurred': dict(dpi=300, blur=1.5),
+    'low_dpi': dict(dpi=150),
+    'high_dpi': dict(dpi=600),
+    'letter': dict(dpi=200, page_size='letter', skew=-2.0, noise=10.0),
+    'receipt': dict(dpi=200, page_size='receipt'),
+}
+
+# The operations a user typically applies in ImagePreprocessor before OCR
+PREPROCESS_STEPS = (('deskew', {}), ('contrast', {'alpha': 1.2}), ('binarize', {}))
+
+
+def edit_distance(a, b):
+    """
+    Levenshtein distance, one row at a time with the insertion chain resolved by a running minimum.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if not b:
+        return len(a)
+    b_codes = np.frombuffer(b.encode('utf-32-le'), np.uint32)
+    offsets = np.arange(len(b) + 1)
+    previous = offsets.copy()
+    for i, char in enumerate(a, start=1):
+        cost = (b_codes != ord(char)).astype(np.int64)
+        current = np.empty_like(previous)
+        current[0] = i
+        current[1:] = np.minimum(previous[1:] + 1, previous[:-1] + cost)
+        # current[j] = min over k <= j of current[k] + (j - k)
+        current = np.minimum.accumulate(current - offsets) + offsets
+        previous = current
+    return int(previous[-1])
+
+
+def character_error_rate(truth, text):
+    truth, text = " ".join(truth.split()), " ".join(text.split())
+    return edit_distance(truth, text) / max(1, len(truth))
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def percentiles(times):
+    times = np.asarray(times) * 1000
+    return {'p50_ms': round(float(np.percentile(times, 50)), 2),
+            'p99_ms': round(float(np.percentile(times, 99)), 2)}
+
+
+def run_scenario(engine, steps, options, pages):
+    stage_times = {'preprocess': [], 'ocr': [], 'total': []}
+    errors = []
+    start = time.perf_counter()
+    for seed in range(pages):
+        page, truth = make_scan(seed=seed, **options)
+        t0 = time.perf_counter()
+        processed = pipeline.to_gray(steps.run(page))
+        t1 = time.perf_counter()
+        text = engine.process_image(processed)
+        t2 = time.perf_counter()
+        stage_times['preprocess'].append(t1 - t0)
+        stage_times['ocr'].append(t2 - t1)
+        stage_times['total'].append(t2 - t0)
+        errors.append(character_error_rate(truth, text))
+    elapsed = time.perf_counter() - start
+    return {
+        'pages': pages,
+        'pages_per_sec': round(pages / sum(stage_times['total']), 3),
+        'wall_s': round(elapsed, 3),
+        'cer': round(float(np.mean(errors)), 4),
+        **{stage: percentiles(times) for stage, times in stage_times.items()},
+    }
+
+
+def environment(engine):
+    try:
+        tesseract = engine.tesseract_version()
+    except Exception as e:
+        tesseract = f"unavailable: {e}"
+    return {
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'tesseract': str(tesseract),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns a list of regression messages for metrics worse than the baseline by more than tolerance.
+    """
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        if current['pages_per_sec'] < previous['pages_per_sec'] * (1 - tolerance):
+            regressions.append(f"{name}: {current['pages_per_sec']} pages/s, baseline {previous['pages_per_sec']}")
+        for stage in ('preprocess', 'ocr', 'total'):
+            # Tail latency from a handful of pages is noisy, so p99 gets twice the tolerance
+            for metric, allowed in (('p50_ms', tolerance), ('p99_ms', 2 * tolerance)):
+                now, before = current[stage][metric], previous[stage][metric]
+                if now > before * (1 + allowed) and now - before > 1.0:
+                    regressions.append(f"{name}: {stage} {metric[:3]} {now} ms, baseline {before} ms")
+        # CER is deterministic for a given Tesseract build, so any rise beyond noise counts
+        if current['cer'] > previous['cer'] + 0.005:
+            regressions.append(f"{name}: CER {current['cer']}, baseline {previous['cer']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=5, help="Pages per scenario")
+    parser.add_argument("--scenarios", default=None,
+                        help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Write these results as the new baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed relative slowdown before a metric counts as a regression")
+    args = parser.parse_args(argv)
+
+    names = args.scenarios.split(',') if args.scenarios else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    config = Config()
+    config.cache_path = None
+    engine = OCREngine(config)
+    steps = pipeline.Pipeline()
+    for name, params in PREPROCESS_STEPS:
+        steps.add(name, **params)
+
+    results = {'environment': environment(engine), 'scenarios': {}}
+    print(f"{'scenario':<10}{'pages/s':>9}{'CER':>8}{'pre p50':>9}{'pre p99':>9}"
+          f"{'ocr p50':>9}{'ocr p99':>9}{'tot p99':>9}")
+    for name in names:
+        result = run_scenario(engine, steps, SCENARIOS[name], args.pages)
+        results['scenarios'][name] = result
+        print(f"{name:<10}{result['pages_per_sec']:>9.2f}{result['cer']:>8.3f}"
+              f"{result['preprocess']['p50_ms']:>9.1f}{result['preprocess']['p99_ms']:>9.1f}"
+              f"{result['ocr']['p50_ms']:>9.1f}{result['ocr']['p99_ms']:>9.1f}"
+              f"{result['total']['p99_ms']:>9.1f}")
+    results['peak_rss_mb'] = peak_rss_mb()
+    if results['peak_rss_mb'] is not None:
+        print(f"peak RSS {results['peak_rss_mb']:.0f} MB")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.isfile(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('environment') != results['environment']:
+        print("Warning: baseline was recorded in a different environment:", baseline.get('environment'))
+    regressions = compare(results, baseline, args.tolerance)
+    previous_rss = baseline.get('peak_rss_mb')
+    if previous_rss and results['peak_rss_mb'] and results['peak_rss_mb'] > previous_rss * (1 + args.tolerance):
+        regressions.append(f"peak RSS {results['peak_rss_mb']:.0f} MB, baseline {previous_rss:.0f} MB")
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if not regressions:
+        print("No regressions against the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Synthetic document pages with known ground truth, for benchmarks.
+"""
+import cv2
+import numpy as np
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog invoice total amount date number "
+    "customer account payment order shipping address reference page section "
+    "report summary item quantity price tax balance due signature approved"
+).split()
+
+
+def random_text(rng, lines=20, words_per_line=8):
+    return "\n".join(
+        " ".join(rng.choice(WORDS, size=words_per_line)) for _ in range(lines)
+    )
+
+
+def render_page(text, width=1240, height=1754, font_scale=1.0, thickness=2, margin=80):
+    """
+    Draws black text on a white grayscale page, one text line per row.
+    """
+    page = np.full((height, width), 255, np.uint8)
+    line_height = int(40 * font_scale)
+    y = margin + line_height
+    for line in text.split("\n"):
+        if y > height - margin:
+            break
+        cv2.putText(page, line, (margin, y), cv2.FONT_HERSHEY_SIMPLEX,
+                    font_scale, 0, thickness, cv2.LINE_AA)
+        y += line_height
+    return page
+
+
+def make_page(seed=0, lines=20, words_per_line=8, **render_args):
+    """
+    Returns (page, ground_truth_text) for a reproducible random page.
+    """
+    rng = np.random.default_rng(seed)
+    text = random_text(rng, lines, words_per_line)
+    return render_page(text, **render_args), text
+
+
+def rotate_page(page, angle):
+    """
+    Rotates a page by angle degrees (counter-clockwise), filling the corners with white.
+    """
+    h, w = page.shape[:2]
+    M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+    return cv2.warpAffine(page, M, (w, h), flags=cv2.INTER_LINEAR, borderValue=255)
+
+
+# Page sizes in inches
+PAGE_SIZES = {
+    'a4': (8.27, 11.69),
+    'letter': (8.5, 11.0),
+    'a5': (5.83, 8.27),
+    'receipt': (3.15, 6.0),
+}
+
+
+def degrade(page, rng, noise=0.0, blur=0.0):
+    """
+    Adds Gaussian blur (sigma in pixels) and Gaussian sensor noise (sigma in gray levels).
+    """
+    if blur > 0:
+        page = cv2.GaussianBlur(page, (0, 0), blur)
+    if noise > 0:
+        noisy = page.astype(np.float32) + rng.normal(0.0, noise, page.shape).astype(np.float32)
+        page = np.clip(noisy, 0, 255).astype(np.uint8)
+    return page
+
+
+def make_scan(seed=0, dpi=300, page_size='a4', skew=0.0, noise=0.0, blur=0.0,
+              lines=None, words_per_line=8):
+    """
+    Returns (page, ground_truth_text) for a page as a scanner would produce it.
+
+    Text is about 12 pt at any dpi. By default the page is filled with lines down to the
+    bottom margin. The page is then rotated by skew degrees, blurred and noised.
+    """
+    rng = np.random.default_rng(seed)
+    scale = dpi / 150
+    width_in, height_in = PAGE_SIZES[page_size]
+    width, height = round(width_in * dpi), round(height_in * dpi)
+    margin = round(0.5 * dpi)
+    line_height = int(40 * scale)
+    if lines is None:
+        lines = max(1, (height - 2 * margin) // line_height - 1)
+    # Keep lines inside the page width: a word averages ~6 glyphs of ~20 px at scale 1
+    words_per_line = max(1, min(words_per_line, int((width - 2 * margin) / (scale * 120))))
+    text = random_text(rng, lines, words_per_line)
+    page = render_page(text, width, height, font_scale=scale,
+                       thickness=max(1, round(2 * scale)), margin=margin)
+    # render_page stops at the bottom margin; keep only the lines that were drawn
+    drawn = max(0, (height - margin - (margin + line_height)) // line_height + 1)
+    text = "\n".join(text.split("\n")[:drawn])
+    if skew:
+        page = rotate_page(page, skew)
+    return degrade(page, rng, noise, blur), text
@@ -8,6 +8,10 @@ class Config:
     def __init__(self):
         self.input_path = ".input"
         self.output_path = ".output"
+        self.watch_interval = 2.0  # Seconds between scans of input_path in watch mode
+        self.watch_max_attempts = 3  # Times a failing page is retried before it is left as failed
+        self.export_formats = ['txt', 'hocr', 'tsv', 'pdf']  # Outputs rendered per page by batch_export
+        self.export_manifest_name = "manifest.jsonl"  # One JSON line per exported page, in output_path
         self.language = "eng"
         self.tesseract_path = os.getenv("TESSERACT")
 
@@ -25,10 +29,92 @@ class Config:
             'block_size': 11,
             'c': 2
         }
+        # Stages run by pipeline.AutoPreprocessor, in order
+        self.auto_preprocess_stages = ['denoise', 'clahe', 'adaptive_threshold', 'deskew']
+
+        # Upload panel thumbnails
+        self.thumbnail_size = (100, 100)
+        self.thumbnail_workers = 4
+        self.thumbnail_cache_path = os.path.join(".cache", "thumbnails")
+
+        # Preprocessing editor undo/redo history
+        self.history_keyframe_interval = 5  # Operations between compressed snapshots
+        self.history_memory_budget = 64 * 1024 * 1024  # Bytes of compressed snapshots kept
 
         # OCR engine settings
         self.psm = 3  # Page segmentation mode
         self.oem = 1  # OCR Engine mode
+        self.ocr_workers = None  # Batch OCR processes, defaults to the CPU count
+        self.ocr_chunk_size = 1  # Images sent to one Tesseract invocation in batch mode
+        self.tesseract_transport = 'pipe'  # 'pipe' streams raw PNM over stdin, 'file' uses pytesseract temp files
+
+        # Blank and non-text pages skipped before Tesseract (page_classifier.py)
+        self.skip_blank_pages = True
+        self.skip_page_max_side = 1024  # Longest side of the reduced copy that is classified
+        self.skip_page_margin = 0.03  # Fraction of each edge ignored (scanner borders, punch holes)
+        self.skip_page_ink_contrast = 80  # Levels below the paper's median brightness counted as ink
+        self.skip_page_max_blank_ink = 0.001  # Ink fraction under which a page without any glyph is blank
+        self.skip_page_min_text_components = 5  # Character-sized ink blobs on text lines that make a page text
+        self.skip_page_min_picture_ink = 0.01  # Ink fraction above which a page with fewer of them is non-text
+
+        # Resolution normalization before Tesseract (resolution.py)
+        self.normalize_resolution = True
+        self.normalize_text_height = 30  # Target median glyph height in pixels (12 pt text at 300 dpi)
+        self.normalize_tolerance = 0.25  # Pages within this fraction of the target are not resampled
+        self.normalize_min_scale = 0.25
+        self.normalize_max_scale = 3.0
+        self.normalize_max_side = 2048  # Longest side of the reduced copy the text height is measured on
+        self.decode_max_dpi = 300  # Files whose header reports at least twice this are decoded reduced, None disables
+
+        # Tiled OCR for oversized pages
+        self.tile_threshold_pixels = 50_000_000  # Pages above this pixel count are tiled, None disables
+        self.tile_height = 2048  # Strip height in pixels
+        self.tile_overlap = 256  # Rows shared by neighbouring strips, at least two text lines
+        self.tile_workers = None  # Strips recognized in parallel, defaults to the CPU count
+        self.max_upload_bytes = None  # Upload size limit, None accepts any size
+        self.max_image_pixels = 300_000_000  # Pillow warns above this and refuses twice it (an A0 sheet at 600 dpi is 560 MP)
+
+        # Layout-driven OCR of the detected text blocks only (layout.py)
+        self.region_ocr = False  # Recognize text regions instead of the whole page
+        self.layout_max_side = 1600  # Longest side of the reduced copy used for layout analysis
+        self.region_max_count = 16  # More regions than this fall back to whole-page OCR
+        self.region_max_coverage = 0.8  # Regions covering more of the page fall back as well
+        self.region_workers = None  # Regions recognized in parallel, defaults to the CPU count
+
+        # OCR result cache, set cache_path to None to disable
+        self.cache_path = os.path.join(".cache", "ocr_cache.sqlite3")
+        self.cache_max_bytes = 256 * 1024 * 1024
+
+        # Near-duplicate pages reuse an earlier OCR result (near_duplicates.py)
+        self.near_duplicates = False  # Look pages up by perceptual hash before running Tesseract
+        self.near_duplicate_path = os.path.join(".cache", "near_duplicates.sqlite3")
+        self.near_duplicate_max_distance = 8  # pHash bits that may differ, out of 64
+        self.near_duplicate_verify = 'pixels'  # 'none', 'dhash' or 'pixels' (aligned proxy comparison)
+        self.near_duplicate_max_difference = 12.0  # Largest mean difference of any 8x8 proxy cell, in levels
+        self.near_duplicate_max_pages = 100000  # Oldest pages are dropped beyond this many
+
+        # Processed images spilled to memory-mapped .npy files, with a small in-memory LRU
+        self.array_store_path = os.path.join(".cache", "arrays")
+        self.array_store_hot_bytes = 256 * 1024 * 1024
+
+        # Background jobs (preprocessing, OCR) in the GUI and batch CLI
+        self.scheduler_workers = 2  # Jobs running at once; OCR jobs add their own process pool
+        self.job_retries = 1  # Extra attempts for a failed job
+        self.job_retry_delay = 0.5  # Seconds before the first retry, growing per attempt
+        self.progress_interval_ms = 100  # How often the GUI applies queued progress events
+
+        # Speculative OCR in the GUI: pages are OCR'd in the background from upload on
+        self.speculative_ocr = True
+        self.speculative_priority = -1  # Below page loading (1) and "Run OCR" (0)
+        self.speculative_delay_ms = 800  # Quiet time after an edit before the page is OCR'd again
+
+        # Per-stage timing (tracing.py); the histograms are cheap, the JSON-lines trace is optional
+        self.tracing_enabled = True
+        self.trace_path = None  # JSON-lines file receiving one event per span
+        self.metrics_path = None  # Prometheus text file written at the end of a run
+
+        # Full-text index of OCR results, set search_index_path to None to disable
+        self.search_index_path = os.path.join(".cache", "search_index.sqlite3")
 
         # Format conversion rules
         self.metadata = {
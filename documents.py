@@ -0,0 +1,108 @@
+import logging
+from collections import namedtuple
+import cv2
+import numpy as np
+from PIL import Image
+from config import Config
+import pipeline
+import resolution
+import tracing
+
+MULTIPAGE_EXTENSIONS = ('.tif', '.tiff')
+
+# Large-format drawings and 600-dpi newspaper pages exceed Pillow's default decompression bomb
+# guard; raise it to a bound that still rejects bombs (Pillow refuses twice this many pixels)
+Image.MAX_IMAGE_PIXELS = Config().max_image_pixels
+
+# A page of an input document; page is zero-based
+PageRef = namedtuple('PageRef', ['document', 'page', 'page_count'])
+PageResult = namedtuple('PageResult', ['document', 'page', 'page_count', 'text'])
+
+
+def is_multipage(path):
+    return path.lower().endswith(MULTIPAGE_EXTENSIONS)
+
+
+def page_count(path):
+    """
+    Counts the pages of a document by walking the TIFF directory chain, without decoding pixels.
+    """
+    if not is_multipage(path):
+        return 1
+    with Image.open(path) as img:
+        return getattr(img, 'n_frames', 1)
+
+
+def _to_array(img):
+    # Keep single-channel pages as grayscale to avoid tripling their memory
+    if img.mode in ('I;16', 'I;16B', 'I'):
+        return (np.asarray(img, dtype=np.uint32) >> 8).clip(0, 255).astype(np.uint8)
+    if img.mode in ('1', 'L', 'LA'):
+        return np.asarray(img.convert('L'))
+    return cv2.cvtColor(np.asarray(img.convert('RGB')), cv2.COLOR_RGB2BGR)
+
+
+def load_page(path, page=0, max_dpi=None):
+    """
+    Decodes a single page of a document as a BGR or grayscale array.
+
+    With max_dpi, a page whose header reports at least twice that resolution is reduced by a
+    power of two while it is decoded (see resolution.decode_reduction).
+    """
+    return load_page_reduced(path, page, max_dpi)[0]
+
+
+def load_page_reduced(path, page=0, max_dpi=None):
+    """
+    Like load_page, but returns (image, reduction), the factor the page was shrunk by while
+    decoding; multiplying the image's pixel coordinates by it gives the file's.
+    """
+    if not is_multipage(path):
+        if page != 0:
+            raise IndexError(f"{path} has a single page, requested page {page}")
+        reduction = resolution.decode_reduction(path, max_dpi)
+        return pipeline.load_image(path, reduction), reduction
+    try:
+        with tracing.span('decode'), Image.open(path) as img:
+            img.seek(page)
+            image = _to_array(img)
+            reduction = resolution.reduction_for_dpi(resolution.header_dpi(img), max_dpi)
+            # TIFF frames cannot be decoded reduced; shrink right away so the full page is short-lived
+            return resolution.resample(image, 1 / reduction), reduction
+    except (OSError, EOFError) as e:
+        raise FileNotFoundError(f"Could not load page {page} of {path}: {e}")
+
+
+def iter_page_refs(paths):
+    """
+    Yields a PageRef for every page of every document, in order.
+    """
+    logger = logging.getLogger(__name__)
+    for path in paths:
+        try:
+            count = page_count(path)
+        except OSError as e:
+            logger.error(f"Could not read page count of {path}: {e}")
+            continue
+        for index in range(count):
+            yield PageRef(path, index, count)
+
+
+def ocr_pages(ocr_engine, paths, **batch_args):
+    """
+    Streams every page of the given documents through OCREngine.process_batch and yields a
+    PageResult per page. Workers decode their own pages, so only page references and text
+    cross process boundaries and no document is ever held in memory as a whole. With
+    output='words' the result's text field holds a WordTable, with output='formats' a dictionary
+    of rendered outputs.
+    """
+    refs = {}
+
+    def tracked_refs():
+        for index, ref in enumerate(iter_page_refs(paths)):
+            refs[index] = ref
+            yield ref
+
+    for index, text in ocr_engine.process_batch(tracked_refs(), **batch_args):
+        ref = refs.pop(index)
+        yield PageResult(ref.document, ref.page, ref.page_count, text)
@@ -0,0 +1,132 @@
+import cv2
+import logging
+import numpy as np
+import pipeline
+import tracing
+
+
+class EditHistory:
+    """
+    Undo/redo for an image as a log of parameterized pipeline operations.
+
+    Operations are only recorded when pushed; the full-resolution image is rebuilt on demand
+    through `current`, replaying the log from the nearest keyframe or the last rendered state.
+    Only the base image, the last rendered image and a few PNG-compressed keyframes are kept
+    in memory, and keyframes farthest from the cursor are dropped when the memory budget is
+    exceeded.
+    """
+    def __init__(self, base_image, keyframe_interval=5, memory_budget=64 * 1024 * 1024):
+        self.base_image = base_image
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.memory_budget = memory_budget
+        self.ops = []
+        self.cursor = 0
+        self.keyframes = {}
+        self._current = base_image
+        self._current_index = 0
+
+    @classmethod
+    def from_config(cls, base_image, config):
+        return cls(base_image, config.history_keyframe_interval, config.history_memory_budget)
+
+    @property
+    def can_undo(self):
+        return self.cursor > 0
+
+    @property
+    def can_redo(self):
+        return self.cursor < len(self.ops)
+
+    @property
+    def active_ops(self):
+        return self.ops[:self.cursor]
+
+    @property
+    def current(self):
+        """
+        Full-resolution image after the operations up to the cursor, rendered on first access.
+        """
+        if self._current_index != self.cursor:
+            self._current = self.render(self.cursor)
+            self._current_index = self.cursor
+        return self._current
+
+    @property
+    def is_rendered(self):
+        return self._current_index == self.cursor
+
+    def release(self):
+        """
+        Drops the last rendered image, e.g. once it has been handed on; current renders it again.
+        """
+        self._current, self._current_index = self.base_image, 0
+
+    def push(self, name, **params):
+        """
+        Records an operation after the cursor, discarding any redo entries.
+        """
+        if name not in pipeline.OPERATIONS:
+            raise ValueError(f"Unknown edit operation: {name}")
+        del self.ops[self.cursor:]
+        for index in [index for index in self.keyframes if index > self.cursor]:
+            del self.keyframes[index]
+        if self._current_index > self.cursor:
+            self._current, self._current_index = self.base_image, 0
+        self.ops.append((name, params))
+        self.cursor += 1
+
+    def undo(self):
+        if not self.can_undo:
+            return False
+        self.cursor -= 1
+        return True
+
+    def redo(self):
+        if not self.can_redo:
+            return False
+        self.cursor += 1
+        return True
+
+    def reset(self):
+        self.ops.clear()
+        self.keyframes.clear()
+        self.cursor = 0
+        self._current, self._current_index = self.base_image, 0
+        return self.base_image
+
+    def render(self, index):
+        """
+        Rebuilds the image after the first index operations from the nearest known state.
+        """
+        start = max((k for k in self.keyframes if k <= index), default=0)
+        if self._current_index <= index and self._current_index >= start:
+            start, image = self._current_index, self._current
+        elif start:
+            image = self._decode(self.keyframes[start])
+        else:
+            image = self.base_image
+
+        for step in range(start, index):
+            name, params = self.ops[step]
+            with tracing.span(f'edit.{name}'):
+                image = pipeline.OPERATIONS[name](image, **params)
+            if (step + 1) % self.keyframe_interval == 0 and step + 1 not in self.keyframes:
+                self._add_keyframe(step + 1, image)
+        return image
+
+    def memory_usage(self):
+        return sum(len(data) for data in self.keyframes.values())
+
+    def _add_keyframe(self, index, image):
+        ok, encoded = cv2.imencode('.png', image, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        if not ok:
+            logging.getLogger(__name__).warning(f"Could not encode keyframe {index}")
+            return
+        self.keyframes[index] = encoded.tobytes()
+        while self.keyframes and self.memory_usage() > self.memory_budget:
+            farthest = max(self.keyframes, key=lambda k: abs(k - self.cursor))
+            del self.keyframes[farthest]
+
+    @staticmethod
+    def _decode(data):
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
@@ -8,23 +8,55 @@ from tkinter import *
 from tkinter import ttk, filedialog, messagebox
 from PIL import Image, ImageTk
 from config import Config
+from edit_history import EditHistory
+from preview import PreviewProxy
+import documents
+import pipeline
 
 class ImagePreprocessor:
-    def __init__(self, parent, image_path):
+    def __init__(self, parent, image_path, config=None, page=0, image=None, decode_reduction=1,
+                 store=None, on_change=None):
         self.root = Toplevel(parent)
         self.root.title("Image Preprocessing")
         self.root.geometry("1080x720")  # Main window size set here
         self.root.minsize(1024, 600)
         self.image_path = image_path
-        self.original_image = cv2.imread(image_path)
-        if self.original_image is None:
-            raise FileNotFoundError(f"Could not load image at path: {image_path}")
-        self.current_image = self.original_image.copy()
-        self.edit_stack = []
-        self.redo_stack = []
+        self.page = page
+        # The page may already have been decoded off the Tk thread
+        self.config = config or Config()
+        # decode_reduction is how much smaller than the file the page was decoded
+        if image is None:
+            image, decode_reduction = documents.load_page_reduced(
+                image_path, page, self.config.decode_max_dpi)
+        self.original_image = image
+        self.decode_reduction = decode_reduction
+        if store is not None:
+            # Keep the unedited page on disk; edits replay from the read-only memory map
+            store.put(("original", image_path, page), self.original_image)
+            self.original_image = store.open(("original", image_path, page))
+        self.history = EditHistory.from_config(self.original_image, self.config)
+        self.preview = PreviewProxy(
+            self.original_image, max_size=(self.root.winfo_screenwidth(), self.root.winfo_screenheight()))
+        # Called with this preprocessor whenever the edits that OCR would see change
+        self.on_change = on_change
         
         self.setup_ui()
         self.show_image()
+
+    @property
+    def current_image(self):
+        # Edits are previewed on the proxy; the full-resolution image is replayed on demand
+        return self.history.current
+
+    def _record_edit(self, name, **params):
+        self.history.push(name, **params)
+        self.preview.apply(name, params)
+        self.show_image()
+        self._changed()
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change(self)
         
     def setup_ui(self):
         # Main frame
@@ -96,14 +128,7 @@ class ImagePreprocessor:
         apply_button = ttk.Button(dialog, text="Apply", command=apply_rotation)
         apply_button.pack(pady=5)
     def apply_rotate(self, angle):
-        self.edit_stack.append(self.current_image.copy())
-        self.redo_stack.clear()
-        
-        (h, w) = self.current_image.shape[:2]
-        center = (w // 2, h // 2)
-        M = cv2.getRotationMatrix2D(center, angle, 1.0)
-        self.current_image = cv2.warpAffine(self.current_image, M, (w, h))
-        self.show_image()
+        self._record_edit('rotate', angle=angle)
     
     def start_crop(self):
         self.crop_start = None
@@ -135,26 +160,22 @@ class ImagePreprocessor:
         x2 = int((event.x - offset_x) / scale)
         y2 = int((event.y - offset_y) / scale)
 
-        # Ensure coordinates are within image bounds
-        h, w = self.current_image.shape[:2]
-        x1, x2 = sorted([max(0, min(x1, w)), max(0, min(x2, w))])
-        y1, y2 = sorted([max(0, min(y1, h)), max(0, min(y2, h))])
+        # Ensure coordinates are within the full-resolution image bounds
+        w, h = self.preview.full_size
+        box = pipeline.crop_box(w, h, x1, y1, x2, y2)
 
         # Apply crop if valid region
-        if x2 > x1 and y2 > y1:
-            self.edit_stack.append(self.current_image.copy())
-            self.redo_stack.clear()
-            self.current_image = self.current_image[y1:y2, x1:x2]
-            self.show_image()
+        if box is not None:
+            x1, y1, x2, y2 = box
+            self._record_edit('crop', x1=x1, y1=y1, x2=x2, y2=y2)
         
         self.image_panel.delete(self.crop_rect)
         self.status.config(text="Ready")
 
     # Add this to your image display method
     def show_image(self):
-        # Convert OpenCV image to RGB
-        img = cv2.cvtColor(self.current_image, cv2.COLOR_BGR2RGB)
-        h, w = img.shape[:2]
+        # Scale is computed against the full-resolution size so crop mapping stays exact
+        w, h = self.preview.full_size
         
         # Calculate scaling and offset for display
         panel_width = self.image_panel.winfo_width()
@@ -164,10 +185,13 @@ class ImagePreprocessor:
         self.display_offset_x = (panel_width - w * scale) / 2
         self.display_offset_y = (panel_height - h * scale) / 2
         
-        # Resize image for display
-        display_w = int(w * scale)
-        display_h = int(h * scale)
-        img_resized = cv2.resize(img, (display_w, display_h))
+        # Resize the preview proxy for display, then convert only the displayed pixels to RGB
+        display_w = max(1, int(w * scale))
+        display_h = max(1, int(h * scale))
+        proxy = self.preview.select_level(display_w, display_h)
+        img_resized = cv2.resize(proxy, (display_w, display_h), interpolation=cv2.INTER_AREA)
+        if img_resized.ndim == 3:
+            img_resized = cv2.cvtColor(img_resized, cv2.COLOR_BGR2RGB)
         
         # Update display (using PIL for compatibility)
         self.tk_image = ImageTk.PhotoImage(Image.fromarray(img_resized))
@@ -188,66 +212,36 @@ class ImagePreprocessor:
         
         
     def apply_contrast(self, alpha):
-        self.edit_stack.append(self.current_image.copy())
-        self.redo_stack.clear()
-        self.current_image = cv2.convertScaleAbs(self.current_image, alpha=alpha, beta=0)
-        self.show_image()
+        self._record_edit('contrast', alpha=alpha)
         
     def binarize_image(self):
-        self.edit_stack.append(self.current_image.copy())
-        self.redo_stack.clear()
-        gray = cv2.cvtColor(self.current_image, cv2.COLOR_BGR2GRAY)
-        _, self.current_image = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY+cv2.THRESH_OTSU)
-        self.current_image = cv2.cvtColor(self.current_image, cv2.COLOR_GRAY2BGR)
-        self.show_image()
+        self._record_edit('binarize')
         
     def deskew_image(self):
-        self.edit_stack.append(self.current_image.copy())
-        self.redo_stack.clear()
-        self.current_image = self._deskew(self.current_image)
-        self.show_image()
-        
-    def _deskew(self, image):
-        # Existing deskew implementation from original code
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        edges = cv2.Canny(blurred, 50, 150, apertureSize=3)
-        kernel = np.ones((3,3), np.uint8)
-        edges = cv2.dilate(edges, kernel, iterations=1)
-        
-        lines = cv2.HoughLinesP(edges, rho=1, theta=np.pi/180,
-                              threshold=100, minLineLength=gray.shape[1]//2,
-                              maxLineGap=20)
-        
-        if lines is not None:
-            angles = [np.arctan2(y2-y1, x2-x1)*180/np.pi for line in lines for x1,y1,x2,y2 in line]
-            median_angle = np.median(angles)
-            (h, w) = image.shape[:2]
-            center = (w//2, h//2)
-            M = cv2.getRotationMatrix2D(center, median_angle, 1.0)
-            return cv2.warpAffine(image, M, (w, h), flags=cv2.INTER_CUBIC,
-                                borderMode=cv2.BORDER_REPLICATE)
-        return image
+        # Estimate on the proxy and log the angle so the full-resolution replay is a plain rotation
+        angle = pipeline.estimate_skew_angle(pipeline.to_gray(self.preview.image))
+        self._record_edit('deskew', angle=angle)
         
     def undo_edit(self):
-        if self.edit_stack:
-            self.redo_stack.append(self.current_image)
-            self.current_image = self.edit_stack.pop()
+        if self.history.undo():
+            self.preview.render(self.history.active_ops)
             self.show_image()
+            self._changed()
             
     def redo_edit(self):
-        if self.redo_stack:
-            self.edit_stack.append(self.current_image)
-            self.current_image = self.redo_stack.pop()
+        if self.history.redo():
+            self.preview.apply(*self.history.ops[self.history.cursor - 1])
             self.show_image()
+            self._changed()
 
     def apply_changes(self):
-        # Implement logic to apply all changes made in the preprocessor
+        # OCR replays the edits from the original itself; nothing is rendered at full resolution here
         self.root.destroy()
 
     def cancel_changes(self):
         # Implement logic to discard all changes and close the preprocessor
-        self.current_image = self.original_image.copy()
+        self.history.reset()
+        self._changed()
         self.root.destroy()
 
 def preprocess_image(image_path: str, preprocess_flag: bool, config: Config):
@@ -0,0 +1,149 @@
+"""
+Layout analysis that finds the text blocks on a page, so OCR can skip photos, logos and margins.
+
+The page is reduced and thresholded as in page_classifier and its glyph-sized ink components
+are kept, except those touching pictures (large non-glyph ink such as photos and drawings). A
+horizontal dilation scaled to the median glyph height joins glyphs into lines, and lines of
+similar extent stacked closely merge into blocks. The blocks are ordered for reading with a recursive XY-cut on the gaps between them (see xy_cut).
+"""
+from collections import namedtuple
+import cv2
+import numpy as np
+import page_classifier
+
+# Tesseract page segmentation modes for a single text line and a uniform block
+PSM_LINE = 7
+PSM_BLOCK = 6
+
+TextRegion = namedtuple('TextRegion', ['left', 'top', 'right', 'bottom', 'psm'])
+
+
+def detect_text_regions(gray, max_side=1600, ink_contrast=80, min_glyphs=3):
+    """
+    Returns the text blocks of a grayscale page as TextRegions in full-resolution coordinates,
+    in reading order. Single lines get PSM_LINE, everything else PSM_BLOCK.
+    """
+    small = page_classifier.reduce_page(gray, max_side)
+    scale = gray.shape[0] / small.shape[0]
+    h, w = small.shape[:2]
+    ink = page_classifier.ink_mask(small, ink_contrast)
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    keep = np.zeros(count, bool)
+    keep[1:] = page_classifier.glyph_like(stats[1:], h, w)
+    if not keep.any():
+        return []
+    line_height = float(np.median(stats[keep, cv2.CC_STAT_HEIGHT]))
+
+    # Pictures: large non-glyph ink closed into solid areas. Their texture also breaks into
+    # glyph-sized specks, so glyphs touching a picture area are dropped with it
+    large = ~keep & (stats[:, cv2.CC_STAT_AREA] >= 4 * line_height ** 2)
+    large[0] = False
+    if large.any():
+        size = max(3, round(line_height * 2))
+        pictures = cv2.morphologyEx(large[labels].view(np.uint8), cv2.MORPH_CLOSE,
+                                    cv2.getStructuringElement(cv2.MORPH_RECT, (size, size)))
+        keep[np.unique(labels[pictures > 0])] = False
+        keep[0] = False
+        if not keep.any():
+            return []
+        line_height = float(np.median(stats[keep, cv2.CC_STAT_HEIGHT]))
+    glyphs = keep[labels].view(np.uint8)
+
+    # Lines: glyphs joined across word gaps but not across column gutters
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, round(line_height * 1.5)), 1))
+    line_count, line_labels = cv2.connectedComponents(cv2.dilate(glyphs, kernel), connectivity=8)
+    ys, xs = np.nonzero(glyphs)
+    owner = line_labels[ys, xs]
+    left = np.full(line_count, w)
+    top = np.full(line_count, h)
+    right = np.zeros(line_count, int)
+    bottom = np.zeros(line_count, int)
+    np.minimum.at(left, owner, xs)
+    np.minimum.at(top, owner, ys)
+    np.maximum.at(right, owner, xs + 1)
+    np.maximum.at(bottom, owner, ys + 1)
+    component_line = np.zeros(count, int)
+    component_line[labels[ys, xs]] = owner
+    glyph_count = np.bincount(component_line[keep], minlength=line_count)
+    lines = [(left[i], top[i], right[i], bottom[i]) for i in range(1, line_count)
+             if glyph_count[i] >= min_glyphs]
+    boxes = group_lines(sorted(lines, key=lambda line: line[1]), line_height)
+
+    pad = line_height / 2
+    regions = []
+    for x1, y1, x2, y2 in xy_cut(boxes):
+        psm = PSM_LINE if (y2 - y1) < 2 * line_height else PSM_BLOCK
+        regions.append(TextRegion(
+            max(0, int((x1 - pad) * scale)), max(0, int((y1 - pad) * scale)),
+            min(gray.shape[1], int((x2 + pad) * scale + 0.5)),
+            min(gray.shape[0], int((y2 + pad) * scale + 0.5)), psm))
+    return regions
+
+
+def group_lines(lines, line_height):
+    """
+    Merges (left, top, right, bottom) line boxes, sorted by top, into blocks: a line joins
+    the block right above it when the vertical gap is at most about one line and the two
+    overlap across most of the wider one's width.
+    """
+    blocks = []
+    for x1, y1, x2, y2 in lines:
+        for block in reversed(blocks):
+            bx1, by1, bx2, by2 = block
+            overlap = min(x2, bx2) - max(x1, bx1)
+            if 0 <= y1 - by2 <= line_height * 1.2 and overlap > 0.5 * max(x2 - x1, bx2 - bx1):
+                block[:] = [min(x1, bx1), by1, max(x2, bx2), max(y2, by2)]
+                break
+        else:
+            blocks.append([x1, y1, x2, y2])
+    return [tuple(block) for block in blocks]
+
+
+def _gap_split(boxes, start, end):
+    # Groups boxes separated by an empty band along one axis, in increasing order
+    order = sorted(range(len(boxes)), key=lambda i: boxes[i][start])
+    groups, reach = [], None
+    for i in order:
+        if reach is None or boxes[i][start] >= reach:
+            groups.append([])
+            reach = boxes[i][end]
+        groups[-1].append(boxes[i])
+        reach = max(reach, boxes[i][end])
+    return groups
+
+
+def xy_cut(boxes):
+    """
+    Orders (left, top, right, bottom) boxes for reading.
+
+    Boxes are split into rows at horizontal gaps. Consecutive rows that are themselves split
+    into columns are read column by column, so paragraphs whose gaps happen to line up across
+    columns are not interleaved; a full-width element such as a title ends the run.
+    """
+    if len(boxes) <= 1:
+        return list(boxes)
+    rows = _gap_split(boxes, 1, 3)
+    if len(rows) == 1:
+        columns = _gap_split(boxes, 0, 2)
+        if len(columns) == 1:
+            return sorted(boxes, key=lambda box: (box[1], box[0]))
+        return [box for column in columns for box in xy_cut(column)]
+    ordered, run = [], []
+    for row in rows:
+        if len(_gap_split(row, 0, 2)) > 1:
+            run.extend(row)
+            continue
+        ordered += _columns_first(run)
+        run = []
+        ordered += xy_cut(row)
+    return ordered + _columns_first(run)
+
+
+def _columns_first(boxes):
+    if not boxes:
+        return []
+    columns = _gap_split(boxes, 0, 2)
+    if len(columns) == 1:
+        # The rows' gutters do not line up, so read them one row at a time
+        return [box for row in _gap_split(boxes, 1, 3) for box in xy_cut(row)]
+    return [box for column in columns for box in xy_cut(column)]
@@ -1,15 +1,25 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 
-import cv2
 from upload_document import UploadPanel
 from image_preprocess import ImagePreprocessor
 from ocr_engine import OCREngine
 from result_display import ResultDisplay
-import threading
-import queue
+import documents
+import pipeline
+import tracing
+import os
+import time
 import logging
 from config import Config
+from search_index import SearchIndex
+from scheduler import JobScheduler, current_job
+from array_store import ArrayStore
+from speculative import SpeculativeOCR
+from collections import namedtuple
+
+# What run_ocr needs of an editor's page, captured on the Tk thread
+PageSnapshot = namedtuple('PageSnapshot', ['path', 'page', 'ops', 'original', 'reduction'])
 
 class OCRApplication:
     def __init__(self):
@@ -20,6 +30,11 @@ class OCRApplication:
         self.current_docs = []
         self.processed_images = []
         self.ocr_results = []
+        self.config = config = Config()
+        tracing.configure(config)
+        self.search_index = SearchIndex.from_config(config) if config.search_index_path else None
+        # Page pixels live on disk; the lists above keep only references into the store
+        self.array_store = ArrayStore.from_config(config)
         self.setup_ui()
         self.setup_threading()
         
@@ -29,7 +44,7 @@ class OCRApplication:
         main_frame.pack(fill=tk.BOTH, expand=True)
         
         # Upload panel
-        self.upload_panel = UploadPanel(main_frame)
+        self.upload_panel = UploadPanel(main_frame, self.config, on_files_added=self.speculate_files)
         self.upload_panel.frame.pack(fill=tk.BOTH, expand=True)
         
         # Control toolbar
@@ -40,10 +55,20 @@ class OCRApplication:
                                 command=self.start_ocr, state=tk.DISABLED)
         self.btn_results = ttk.Button(toolbar, text="View Results", 
                                     command=self.show_results, state=tk.DISABLED)
+        self.btn_cancel = ttk.Button(toolbar, text="Cancel",
+                                   command=self.cancel_jobs, state=tk.DISABLED)
         
         self.btn_preprocess.pack(side=tk.LEFT, padx=5)
         self.btn_ocr.pack(side=tk.LEFT, padx=5)
         self.btn_results.pack(side=tk.LEFT, padx=5)
+        self.btn_cancel.pack(side=tk.LEFT, padx=5)
+
+        # Full-text search over everything indexed so far
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(toolbar, textvariable=self.search_var, width=30)
+        search_entry.bind("<Return>", lambda event: self.search())
+        ttk.Button(toolbar, text="Search", command=self.search).pack(side=tk.RIGHT, padx=5)
+        search_entry.pack(side=tk.RIGHT, padx=5)
         toolbar.pack(fill=tk.X, pady=5)
         
         # Status bar
@@ -55,87 +80,256 @@ class OCRApplication:
         self.progress.pack(fill=tk.X, pady=2)
         
     def setup_threading(self):
-        self.ocr_thread = None
-        self.preprocess_thread = None
+        # Workers only publish events; widgets are updated from the Tk loop in handle_job_events
+        self.scheduler = JobScheduler.from_config(self.config)
+        self.preprocess_jobs = {}
+        self.preprocess_total = 0
+        self.ocr_job = None
+        # Pages are OCR'd at low priority while the user is still looking at or editing them
+        self.speculative = SpeculativeOCR(self.scheduler, self.config) if self.config.speculative_ocr else None
+        self.speculative_timers = {}
+        self.scheduler.attach_tk(self.root, self.handle_job_events, self.config.progress_interval_ms)
+
+    def speculate_files(self, paths):
+        if self.speculative is None:
+            return
+        for path in paths:
+            try:
+                count = documents.page_count(path)
+            except OSError as e:
+                logging.warning(f"Speculative OCR skipped {path}: {e}")
+                continue
+            for page in range(count):
+                self.speculative.submit(path, page)
+
+    def speculate_edit(self, img_processor):
+        if self.speculative is None:
+            return
+        key = (img_processor.image_path, img_processor.page)
+        # The running result is stale now; start over once the user pauses editing
+        self.speculative.cancel(*key)
+        timer = self.speculative_timers.pop(key, None)
+        if timer is not None:
+            self.root.after_cancel(timer)
+        self.speculative_timers[key] = self.root.after(
+            self.config.speculative_delay_ms, self._resubmit_edited, img_processor)
+
+    def _resubmit_edited(self, img_processor):
+        key = (img_processor.image_path, img_processor.page)
+        self.speculative_timers.pop(key, None)
+        # Replayed from the read-only original by the job, so the editor's history stays on the Tk thread
+        self.speculative.submit(*key, ops=list(img_processor.history.active_ops),
+                                image=img_processor.original_image,
+                                reduction=img_processor.decode_reduction)
         
     def start_preprocessing(self):
         if not self.upload_panel.file_listbox.get(0, tk.END):
             messagebox.showwarning("No Documents", "Please upload documents first")
             return
             
-        self.preprocess_thread = threading.Thread(target=self.run_preprocessing)
-        self.preprocess_thread.start()
-        self.root.after(100, self.check_preprocess)
-        
-    def run_preprocessing(self):
         self.progress["value"] = 0
-        total = len(self.upload_panel.file_listbox.get(0, tk.END))
-        
-        for idx, path in enumerate(self.upload_panel.file_listbox.get(0, tk.END)):
+        for path in self.upload_panel.file_listbox.get(0, tk.END):
             try:
-                preprocessor = ImagePreprocessor(self.root, path)
-                self.processed_images.append(preprocessor)
-                # cv2.imwrite(f"processed_{idx}.png", preprocessor.current_image)
-                self.progress["value"] = (idx+1)/total * 100
-            except Exception as e:
+                count = documents.page_count(path)
+            except OSError as e:
                 logging.error(f"Preprocessing failed: {e}")
-                
-        self.btn_ocr["state"] = tk.NORMAL
-        self.status["text"] = "Preprocessing complete"
+                continue
+            # Multi-page documents get one editor per page, decoded one page at a time
+            for page in range(count):
+                job = self.scheduler.submit(
+                    documents.load_page_reduced, path, page, max_dpi=self.config.decode_max_dpi, priority=1,
+                    retries=self.config.job_retries,
+                    name=f"load {os.path.basename(path)} page {page + 1}")
+                self.preprocess_jobs[job.id] = (path, page, job)
+                self.preprocess_total += 1
+        self.status["text"] = f"Loading {len(self.preprocess_jobs)} pages"
+        self.btn_cancel["state"] = tk.NORMAL
         
-    def check_preprocess(self):
-        if self.preprocess_thread.is_alive():
-            self.root.after(100, self.check_preprocess)
-        else:
-            self.progress["value"] = 0
-            
     def start_ocr(self):
-        self.ocr_thread = threading.Thread(target=self.run_ocr)
-        self.ocr_thread.start()
-        self.root.after(100, self.check_ocr)
-        self.btn_results["state"] = tk.DISABLED
-        
-    def run_ocr(self):
-       
         self.progress["value"] = 0
-        total = len(self.processed_images)
-        import argparse
-        ocr_engine = OCREngine(Config())
+        # The editors belong to the Tk thread; the job only sees this snapshot of their edits
+        pages = [PageSnapshot(p.image_path, p.page, list(p.history.active_ops), p.original_image,
+                              p.decode_reduction)
+                 for p in self.processed_images]
+        for p in self.processed_images:
+            p.history.release()
+        self.ocr_job = self.scheduler.submit(self.run_ocr, pages, name="ocr")
+        self.btn_results["state"] = tk.DISABLED
+        self.btn_cancel["state"] = tk.NORMAL
         
+    def run_ocr(self, pages):
+        job = current_job()
+        total = len(pages)
+        ocr_engine = OCREngine(self.config)
+        done = 0
+
+        # Pages OCR'd in the background in their current state only need their results stored
+        remaining = []
+        for snapshot in pages:
+            words = None
+            if self.speculative is not None:
+                with tracing.span('speculative_wait'):
+                    words = self.speculative.result(snapshot.path, snapshot.page, snapshot.ops)
+            job.check_cancelled()
+            if words is None:
+                remaining.append(snapshot)
+                continue
+            tracing.record('reused.speculative', 0.0)
+            self._store_result(snapshot, self._store_image(snapshot), words)
+            done += 1
+            job.report(done / total, f"OCR {done}/{total} pages")
+
+        # Edits are replayed here from the read-only originals; each rendered page goes to
+        # the array store as it is handed to the pool, so only pages in flight stay in RAM
+        stored = {}
+
+        def images():
+            for i, snapshot in enumerate(remaining):
+                image = pipeline.Pipeline(snapshot.ops).run(snapshot.original)
+                stored[i] = self._store_image(snapshot, image)
+                yield pipeline.to_gray(image)
+
+        # Boxes are reported in the file's pixels; the stored pages stay reduced
+        reductions = {i: snapshot.reduction for i, snapshot in enumerate(remaining)}
+        for i, words in ocr_engine.process_batch(images(), output='words', box_scales=reductions):
+            # Leaving the loop shuts the pool down and drops the chunks not yet started
+            job.check_cancelled()
+            ref = stored.pop(i)
+            if words is not None:
+                self._store_result(remaining[i], ref, words)
+            done += 1
+            job.report(done / total, f"OCR {done}/{total} pages")
+
+    def _store_image(self, snapshot, image=None):
+        if image is None:
+            image = pipeline.Pipeline(snapshot.ops).run(snapshot.original)
+        return self.array_store.put(("processed", snapshot.path, snapshot.page), image)
+
+    def _store_result(self, snapshot, image_ref, words):
+        with tracing.span('result'):
+            if self.search_index is not None:
+                self.search_index.add(os.path.abspath(snapshot.path), snapshot.page, words.text())
+            self.ocr_results.append(
+                {
+                    "input_file": snapshot.path,
+                    "page": snapshot.page,
+                    "process_image": image_ref,
+                    "text": words.text(),
+                    "words": words,
+                    "decode_reduction": snapshot.reduction,
+                    "metadata": dict(
+                        self.config.metadata,
+                        original_filename=os.path.basename(snapshot.path),
+                        processing_timestamp=time.time(),
+                        confidence_scores=words.conf),
+                })
         
-        for idx, img_processor in enumerate(self.processed_images):
-            try:
-                result = ocr_engine.process_image(cv2.cvtColor(img_processor.current_image,cv2.COLOR_RGB2GRAY))
-                self.ocr_results.append(
-                    {
-                        "input_file": img_processor.image_path,
-                        "process_image" : img_processor.current_image,
-                        "text": result,
-                    })
-                self.progress["value"] = (idx+1)/total * 100
-            except Exception as e:
-                logging.error(f"OCR failed: {e}")
-                                
-        self.btn_results["state"] = tk.NORMAL
-        self.status["text"] = "OCR processing complete"
+    def cancel_jobs(self):
+        for _, _, job in list(self.preprocess_jobs.values()):
+            job.cancel()
+        if self.ocr_job is not None:
+            self.ocr_job.cancel()
+        self.status["text"] = "Cancelling..."
         
-    def check_ocr(self):
-        if self.ocr_thread.is_alive():
-            self.root.after(100, self.check_ocr)
-        else:
+    def handle_job_events(self, events):
+        for event in events:
+            if event.job_id in self.preprocess_jobs:
+                self._preprocess_event(event)
+            elif self.ocr_job is not None and event.job_id == self.ocr_job.id:
+                self._ocr_event(event)
+        if not self.preprocess_jobs and (self.ocr_job is None or self.ocr_job.finished):
+            self.btn_cancel["state"] = tk.DISABLED
+            
+    def _preprocess_event(self, event):
+        if event.kind not in ('done', 'failed', 'cancelled'):
+            return
+        path, page, job = self.preprocess_jobs.pop(event.job_id)
+        if event.kind == 'done':
+            self.processed_images.append(
+                ImagePreprocessor(self.root, path, self.config, page=page, image=job.result[0],
+                                  decode_reduction=job.result[1], store=self.array_store,
+                                  on_change=self.speculate_edit))
+        elif event.kind == 'failed':
+            logging.error(f"Preprocessing failed: {event.message}")
+        finished = self.preprocess_total - len(self.preprocess_jobs)
+        self.progress["value"] = finished / self.preprocess_total * 100
+        if not self.preprocess_jobs:
+            self.preprocess_total = 0
+            self.progress["value"] = 0
+            self.status["text"] = "Preprocessing complete"
+            if self.processed_images:
+                self.btn_ocr["state"] = tk.NORMAL
+                
+    def _ocr_event(self, event):
+        if event.kind == 'progress':
+            self.progress["value"] = event.progress * 100
+            self.status["text"] = event.message
+        elif event.kind in ('done', 'failed', 'cancelled'):
+            if event.kind == 'failed':
+                logging.error(f"OCR failed: {event.message}")
             self.progress["value"] = 0
+            self.btn_results["state"] = tk.NORMAL if self.ocr_results else tk.DISABLED
+            self.status["text"] = {"done": "OCR processing complete",
+                                   "failed": "OCR failed",
+                                   "cancelled": "OCR cancelled"}[event.kind]
             
     def show_results(self):
         for image_processor in self.ocr_results:
             img_path = image_processor["input_file"]
             text = image_processor["text"]
-            ResultDisplay(self.root, img_path, text)
+            ResultDisplay(self.root, img_path, text, words=image_processor.get("words"),
+                          page=image_processor.get("page", 0),
+                          image=image_processor.get("process_image"), config=self.config,
+                          decode_reduction=image_processor.get("decode_reduction", 1),
+                          scheduler=self.scheduler)
             
+    def search(self):
+        query = self.search_var.get().strip()
+        if not query or self.search_index is None:
+            return
+        try:
+            hits = self.search_index.search(query, limit=100)
+        except Exception as e:
+            logging.error(f"Search failed: {e}")
+            messagebox.showerror("Search", f"Search failed: {e}")
+            return
+        self.status["text"] = f"{len(hits)} pages match '{query}'"
+
+        window = tk.Toplevel(self.root)
+        window.title(f"Search: {query}")
+        listbox = tk.Listbox(window, width=120, height=20)
+        listbox.pack(fill=tk.BOTH, expand=True)
+        for hit in hits:
+            listbox.insert(tk.END, f"{os.path.basename(hit.document)} [page {hit.page + 1}]  {hit.snippet}")
+        listbox.bind("<Double-Button-1>",
+                     lambda event: self.open_hit(hits[listbox.curselection()[0]])
+                     if listbox.curselection() else None)
+
+    def open_hit(self, hit):
+        for result in self.ocr_results:
+            if os.path.abspath(result["input_file"]) == hit.document and result["page"] == hit.page:
+                ResultDisplay(self.root, result["input_file"], result["text"],
+                              words=result.get("words"), page=hit.page,
+                              image=result.get("process_image"), config=self.config,
+                              decode_reduction=result.get("decode_reduction", 1),
+                              scheduler=self.scheduler)
+                return
+        ResultDisplay(self.root, hit.document, self.search_index.page_text(hit.document, hit.page),
+                      page=hit.page, config=self.config, scheduler=self.scheduler)
+
     def run(self):
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self.array_store.close()
+            tracing.tracer.flush()
+            if self.config.metrics_path:
+                tracing.tracer.write_prometheus(self.config.metrics_path)
 
 if __name__ == "__main__":
-    logger = logging.getLogger('simple_example')
+    # Handlers go on the root logger so every module's messages reach main.log
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
     # create file handler that logs debug and higher level messages
     fh = logging.FileHandler('main.log')
     # create console handler with a higher log level
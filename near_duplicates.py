@@ -0,0 +1,326 @@
+"""
+Perceptual-hash index of OCR'd pages, so repeated pages (cover sheets, standard terms, the same
+document scanned twice) reuse an earlier result instead of going through Tesseract again.
+
+Each page is reduced to a tiny grayscale proxy and summarized by a 64-bit pHash (signs of the
+low DCT frequencies) and a 64-bit dHash (signs of horizontal gradients). Both survive small
+shifts, rescans and compression. Pages whose pHash is within max_distance bits of a stored one
+are candidates; multi-index hashing finds them without comparing against every stored page.
+A candidate is then verified, depending on the verify setting: 'none' trusts the pHash, 'dhash'
+also requires the dHash to be within max_distance, and 'pixels' aligns the stored 128-pixel-wide
+proxy with the new one and requires every 8x8 cell to differ by at most max_difference levels
+on average (see proxy_difference).
+
+Word boxes are stored with the size of the page they were recognized on and scaled to the size
+of the page that reuses them, so a rescan at another resolution gets boxes on its own pixels.
+The index keeps at most max_pages pages and drops the oldest beyond that.
+"""
+import io
+import os
+import itertools
+import sqlite3
+import logging
+import threading
+from collections import namedtuple
+import cv2
+import numpy as np
+from ocr_data import WordTable
+import page_classifier
+
+# Width of the grayscale proxy kept for verification; its height follows the page's aspect ratio
+PROXY_WIDTH = 128
+
+# Side of the square cells compared between aligned proxies, in proxy pixels
+CELL = 8
+
+# Phase correlation peak below which two proxies are not the same page at any shift
+MIN_RESPONSE = 0.5
+
+VERIFY_MODES = ('none', 'dhash', 'pixels')
+
+# size is the page's (width, height) in pixels
+PageSignature = namedtuple('PageSignature', ['phash', 'dhash', 'proxy', 'size'])
+DuplicateMatch = namedtuple('DuplicateMatch', ['page_id', 'distance', 'text', 'words'])
+
+# Bit weights for packing 64 booleans into one integer
+_BITS = np.uint64(1) << np.arange(64, dtype=np.uint64)
+
+
+def _pack(bits):
+    return int(np.bitwise_or.reduce(_BITS[bits.ravel()], initial=np.uint64(0)))
+
+
+def _signed(value):
+    # SQLite integers are signed 64-bit, so hashes are stored as their two's complement
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def signature(gray):
+    """
+    Computes the pHash, dHash and proxy of a grayscale page.
+    """
+    h, w = gray.shape[:2]
+    proxy = page_classifier.reduce_page(gray, PROXY_WIDTH * 4)
+    proxy = cv2.resize(proxy, (PROXY_WIDTH, max(CELL, round(PROXY_WIDTH * h / w))),
+                       interpolation=cv2.INTER_AREA)
+    proxy = cv2.normalize(proxy, None, 0, 255, cv2.NORM_MINMAX)
+    small = cv2.resize(proxy, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].ravel()[1:]
+    # The DC term only encodes brightness; use the next 63 coefficients plus one padding bit
+    phash = _pack(np.append(low > np.median(low), False))
+    tiny = cv2.resize(proxy, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+    dhash = _pack(tiny[:, 1:] > tiny[:, :-1])
+    return PageSignature(phash, dhash, proxy, (w, h))
+
+
+def hamming(a, b):
+    return np.bitwise_count(np.bitwise_xor(a, np.uint64(b)))
+
+
+def proxy_difference(a, b):
+    """
+    Aligns proxy a onto b by phase correlation and returns the largest mean absolute
+    difference of any CELL x CELL cell, or None when no shift makes them match.
+    """
+    if a.shape != b.shape:
+        a = cv2.resize(a, (b.shape[1], b.shape[0]), interpolation=cv2.INTER_AREA)
+    # A light blur absorbs the resampling noise of a shifted rescan; averaging over cells then
+    # still leaves a local change such as a filled-in name on an otherwise identical form
+    a = cv2.GaussianBlur(a.astype(np.float32), (0, 0), 1.0)
+    b = cv2.GaussianBlur(b.astype(np.float32), (0, 0), 1.0)
+    (dx, dy), response = cv2.phaseCorrelate(a, b)
+    if response < MIN_RESPONSE:
+        return None
+    shift = np.float32([[1, 0, dx], [0, 1, dy]])
+    aligned = cv2.warpAffine(a, shift, (a.shape[1], a.shape[0]), borderMode=cv2.BORDER_REPLICATE)
+    # Ignore the border strips the shift filled in
+    margin = int(min(min(a.shape) // 4, abs(dx) + abs(dy) + 2))
+    difference = np.abs(aligned - b)[margin:a.shape[0] - margin, margin:a.shape[1] - margin]
+    rows, cols = difference.shape[0] // CELL, difference.shape[1] // CELL
+    if not rows or not cols:
+        return float(difference.mean())
+    cells = difference[:rows * CELL, :cols * CELL].reshape(rows, CELL, cols, CELL).mean(axis=(1, 3))
+    return float(cells.max())
+
+
+class _HashTable:
+    """
+    In-memory multi-index over the pHashes of one OCR settings combination.
+
+    The 64 bits are split into four 16-bit chunks, each indexed in its own dictionary. Two
+    hashes within max_distance bits differ in at least one chunk by at most max_distance // 4
+    bits (pigeonhole), so probing every chunk value within that radius of the query's chunks
+    yields every candidate; only those are compared in full.
+    """
+    CHUNKS = 4
+    CHUNK_BITS = 16
+
+    def __init__(self, max_distance):
+        radius = max_distance // self.CHUNKS
+        self.flips = [sum(1 << bit for bit in bits) for r in range(radius + 1)
+                      for bits in itertools.combinations(range(self.CHUNK_BITS), r)]
+        self.buckets = [{} for _ in range(self.CHUNKS)]
+        self.ids = []
+        self.phashes = np.zeros(0, np.uint64)
+        self.dhashes = np.zeros(0, np.uint64)
+        self._pending = []
+
+    def _chunks(self, phash):
+        mask = (1 << self.CHUNK_BITS) - 1
+        return [(phash >> (i * self.CHUNK_BITS)) & mask for i in range(self.CHUNKS)]
+
+    def add(self, page_id, phash, dhash):
+        position = len(self.ids)
+        self.ids.append(page_id)
+        self._pending.append((phash, dhash))
+        for chunk, buckets in zip(self._chunks(phash), self.buckets):
+            buckets.setdefault(chunk, []).append(position)
+
+    def candidates(self, phash, max_distance):
+        """
+        Returns (positions, distances) of the stored hashes within max_distance of phash.
+        """
+        if self._pending:
+            added = np.array(self._pending, np.uint64).reshape(-1, 2)
+            self.phashes = np.concatenate([self.phashes, added[:, 0]])
+            self.dhashes = np.concatenate([self.dhashes, added[:, 1]])
+            self._pending = []
+        positions = set()
+        for chunk, buckets in zip(self._chunks(phash), self.buckets):
+            for flip in self.flips:
+                positions.update(buckets.get(chunk ^ flip, ()))
+        if not positions:
+            return np.zeros(0, int), np.zeros(0, int)
+        positions = np.fromiter(positions, int, len(positions))
+        distances = hamming(self.phashes[positions], phash)
+        close = distances <= max_distance
+        order = np.argsort(distances[close], kind='stable')
+        return positions[close][order], distances[close][order]
+
+
+class NearDuplicateIndex:
+    """
+    Persistent store of page signatures and their OCR results in SQLite, with in-memory
+    multi-index tables per OCR settings for the Hamming-distance lookups.
+
+    Several processes may share the file: a lookup that finds nothing first loads the pages
+    other processes added since the last lookup.
+    """
+    # Fraction of max_pages evicted at once, so the tables are not rebuilt on every insert
+    EVICT_FRACTION = 0.1
+
+    def __init__(self, path, max_distance=8, verify='pixels', max_difference=12.0, max_pages=100000):
+        if verify not in VERIFY_MODES:
+            raise ValueError(f"Unknown verification mode {verify!r}, expected one of {VERIFY_MODES}")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_distance = max_distance
+        self.verify = verify
+        self.max_difference = max_difference
+        self.max_pages = max_pages
+        self.hits = 0
+        self.misses = 0
+        self._tables = {}
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "id INTEGER PRIMARY KEY, settings TEXT NOT NULL, phash INTEGER NOT NULL, "
+                "dhash INTEGER NOT NULL, proxy BLOB NOT NULL, text TEXT NOT NULL, words BLOB, "
+                "width INTEGER, height INTEGER)")
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(pages)")]
+            if 'width' not in columns:
+                # Indexes written before page sizes were stored; their words are not reused
+                self._conn.execute("ALTER TABLE pages ADD COLUMN width INTEGER")
+                self._conn.execute("ALTER TABLE pages ADD COLUMN height INTEGER")
+        self._load_new()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.near_duplicate_path, config.near_duplicate_max_distance,
+                   config.near_duplicate_verify, config.near_duplicate_max_difference,
+                   config.near_duplicate_max_pages)
+
+    def _load_new(self):
+        rows = self._conn.execute(
+            "SELECT id, settings, phash, dhash FROM pages WHERE id > ? ORDER BY id",
+            (self._last_id,)).fetchall()
+        for page_id, settings, phash, dhash in rows:
+            self._table(settings).add(page_id, phash & (2 ** 64 - 1), dhash & (2 ** 64 - 1))
+            self._last_id = page_id
+
+    def _table(self, settings):
+        table = self._tables.get(settings)
+        if table is None:
+            table = self._tables[settings] = _HashTable(self.max_distance)
+        return table
+
+    def find(self, page, settings, need_words=False):
+        """
+        Returns a DuplicateMatch for the closest verified page OCR'd with the same settings,
+        or None. With need_words, only pages stored with word-level results qualify.
+        """
+        settings = repr(tuple(settings))
+        with self._lock:
+            match = self._find_locked(page, settings, need_words)
+            if match is None:
+                self._load_new()
+                match = self._find_locked(page, settings, need_words)
+            if match is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return match
+
+    def _find_locked(self, page, settings, need_words):
+        table = self._tables.get(settings)
+        if table is None:
+            return None
+        positions, distances = table.candidates(page.phash, self.max_distance)
+        for position, distance in zip(positions.tolist(), distances.tolist()):
+            if self.verify == 'dhash' and hamming(table.dhashes[position], page.dhash) > self.max_distance:
+                continue
+            page_id = table.ids[position]
+            row = self._conn.execute(
+                "SELECT proxy, text, words, width, height FROM pages WHERE id = ?",
+                (page_id,)).fetchone()
+            if row is None:
+                # Evicted by another process
+                continue
+            proxy, text, words, width, height = row
+            if words is not None and not width:
+                words = None
+            if need_words and words is None:
+                continue
+            if self.verify == 'pixels':
+                stored = cv2.imdecode(np.frombuffer(proxy, np.uint8), cv2.IMREAD_GRAYSCALE)
+                difference = proxy_difference(stored, page.proxy)
+                if difference is None or difference > self.max_difference:
+                    continue
+            if words is not None:
+                words = WordTable.load(io.BytesIO(words))
+                if (width, height) != tuple(page.size):
+                    words = words.scaled(page.size[0] / width, page.size[1] / height)
+            return DuplicateMatch(page_id, distance, text, words)
+        return None
+
+    def add(self, page, settings, text, words=None):
+        """
+        Stores a page's signature with its OCR result and returns its id.
+        """
+        blob = None
+        if words is not None:
+            buffer = io.BytesIO()
+            words.save(buffer, compress=True)
+            blob = buffer.getvalue()
+        settings = repr(tuple(settings))
+        with self._lock:
+            with self._conn:
+                page_id = self._conn.execute(
+                    "INSERT INTO pages (settings, phash, dhash, proxy, text, words, width, height) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (settings, _signed(page.phash), _signed(page.dhash),
+                     cv2.imencode('.png', page.proxy)[1].tobytes(), text, blob,
+                     page.size[0], page.size[1])).lastrowid
+            # Pick up other processes' pages first so ids are added in order
+            self._load_new()
+            if len(self) > self.max_pages:
+                self._evict()
+        logging.getLogger(__name__).debug(f"Near-duplicate index stored page {page_id}")
+        return page_id
+
+    def _evict(self):
+        # Drops the oldest pages and rebuilds the hash tables from what is left
+        keep = max(0, int(self.max_pages * (1 - self.EVICT_FRACTION)))
+        with self._conn:
+            evicted = self._conn.execute(
+                "DELETE FROM pages WHERE id NOT IN (SELECT id FROM pages ORDER BY id DESC LIMIT ?)",
+                (keep,)).rowcount
+        self._tables = {}
+        self._last_id = 0
+        self._load_new()
+        logging.getLogger(__name__).debug(f"Near-duplicate index evicted {evicted} pages")
+
+    def __len__(self):
+        return sum(len(table.ids) for table in self._tables.values())
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'pages': len(self), 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def clear(self):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM pages")
+            self._tables = {}
+            self._last_id = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
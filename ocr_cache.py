@@ -0,0 +1,186 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import numpy as np
+
+
+class OCRCache:
+    """
+    Persistent OCR result store in SQLite, keyed by image content and OCR settings, with LRU eviction.
+
+    Lookups only read. Access times and hit/miss counters are collected in memory and written
+    in one transaction every FLUSH_EVERY lookups or FLUSH_SECONDS, and before any write, so
+    repeat batches are not serialized on a commit per page. A pool worker that exits without
+    close() loses at most its last few seconds of them, which only affects eviction order and
+    the shared counters.
+    """
+    # How many writes a process may make before re-reading the shared total size
+    RESYNC_EVERY = 100
+    # Lookups and seconds after which pending access times and counters are written
+    FLUSH_EVERY = 64
+    FLUSH_SECONDS = 5.0
+
+    def __init__(self, path, max_bytes):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._accessed = {}
+        self._pending_counts = {'hits': 0, 'misses': 0}
+        self._pending_lookups = 0
+        self._last_flush = time.monotonic()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # Losing the last access times in a power cut is harmless; fsyncing each one is not
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_access REAL NOT NULL)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS results_last_access ON results(last_access)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._conn.execute(
+                "INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0)")
+        self._total_bytes = self._read_total()
+        self._writes_since_sync = 0
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.cache_path, config.cache_max_bytes)
+
+    @staticmethod
+    def make_key(image, settings):
+        """
+        Hashes the pixel buffer together with the settings that affect the OCR output.
+        """
+        image = np.ascontiguousarray(image)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(repr(tuple(settings)).encode('utf-8'))
+        digest.update(f"{image.shape}{image.dtype.str}".encode('ascii'))
+        digest.update(memoryview(image).cast('B'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM results WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._accessed[key] = time.time()
+                self._pending_counts['hits'] += 1
+                self.hits += 1
+            else:
+                self._pending_counts['misses'] += 1
+                self.misses += 1
+            self._pending_lookups += 1
+            if (self._pending_lookups >= self.FLUSH_EVERY
+                    or time.monotonic() - self._last_flush >= self.FLUSH_SECONDS):
+                self._flush()
+            return row[0] if row else None
+
+    def flush(self):
+        """
+        Writes the access times and counters of the lookups since the last flush.
+        """
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        if not self._pending_lookups:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE results SET last_access = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._accessed.items()])
+            self._conn.executemany(
+                "UPDATE counters SET value = value + ? WHERE name = ?",
+                [(count, name) for name, count in self._pending_counts.items()])
+        self._accessed = {}
+        self._pending_counts = {'hits': 0, 'misses': 0}
+        self._pending_lookups = 0
+
+    def put(self, key, text):
+        size = len(text.encode('utf-8')) + len(key)
+        with self._lock:
+            # Eviction orders by access time, so it must see the recent lookups
+            self._flush()
+            with self._conn:
+                previous = self._conn.execute(
+                    "SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                    (key, text, size, time.time()))
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self._writes_since_sync += 1
+            if self._writes_since_sync >= self.RESYNC_EVERY:
+                # Other processes may share this file, so re-read the real total now and then
+                self._total_bytes = self._read_total()
+                self._writes_since_sync = 0
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _read_total(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def _evict(self):
+        logger = logging.getLogger(__name__)
+        self._total_bytes = self._read_total()
+        excess = self._total_bytes - self.max_bytes
+        if excess <= 0:
+            return
+        freed = evicted = 0
+        with self._conn:
+            rows = self._conn.execute("SELECT key, size FROM results ORDER BY last_access")
+            keys = []
+            for key, size in rows:
+                if freed >= excess:
+                    break
+                keys.append((key,))
+                freed += size
+            self._conn.executemany("DELETE FROM results WHERE key = ?", keys)
+            evicted = len(keys)
+        self._total_bytes -= freed
+        logger.debug(f"OCR cache evicted {evicted} entries ({freed} bytes)")
+
+    def stats(self):
+        with self._lock:
+            self._flush()
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+            counters = dict(self._conn.execute("SELECT name, value FROM counters"))
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'total_hits': counters.get('hits', 0),
+            'total_misses': counters.get('misses', 0),
+            'entries': entries,
+            'bytes': total,
+            'max_bytes': self.max_bytes,
+        }
+
+    def clear(self):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM results")
+                self._conn.execute("UPDATE counters SET value = 0")
+            self._accessed = {}
+            self._pending_counts = {'hits': 0, 'misses': 0}
+            self._pending_lookups = 0
+            self._total_bytes = 0
+            self.hits = self.misses = 0
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._conn.close()
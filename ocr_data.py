@@ -0,0 +1,184 @@
+import numpy as np
+
+
+class WordTable:
+    """
+    Word-level OCR results stored as NumPy columns instead of per-word objects.
+
+    Each word has a page index, Tesseract block/paragraph/line/word ids, a bounding box and a
+    confidence. Word texts are kept as one UTF-8 buffer with offsets, so a table costs a few
+    dozen bytes per word and round-trips through .npz without pickling.
+    """
+    COLUMNS = {
+        'page': np.uint32,
+        'block': np.uint16,
+        'par': np.uint16,
+        'line': np.uint16,
+        'word': np.uint16,
+        # Boxes of tiled drawings and large-format scans go past 65535 pixels
+        'left': np.int32,
+        'top': np.int32,
+        'width': np.int32,
+        'height': np.int32,
+        'conf': np.float32,
+    }
+
+    def __init__(self, columns, text_data, text_offsets):
+        self.columns = {name: np.asarray(columns[name], dtype) for name, dtype in self.COLUMNS.items()}
+        self.text_data = np.asarray(text_data, np.uint8)
+        self.text_offsets = np.asarray(text_offsets, np.int64)
+
+    def __len__(self):
+        return len(self.text_offsets) - 1
+
+    def __getattr__(self, name):
+        columns = self.__dict__.get('columns')
+        if columns is not None and name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    @classmethod
+    def empty(cls):
+        return cls({name: [] for name in cls.COLUMNS}, [], [0])
+
+    @classmethod
+    def from_tesseract(cls, data, page=0):
+        """
+        Builds a table from pytesseract image_to_data(..., output_type=Output.DICT) output,
+        keeping only recognized words.
+        """
+        conf = np.asarray(data['conf'], np.float32)
+        texts = [text.strip() for text in data['text']]
+        keep = np.flatnonzero((conf >= 0) & np.fromiter((bool(t) for t in texts), bool, len(texts)))
+        encoded = [texts[i].encode('utf-8') for i in keep]
+        offsets = np.zeros(len(encoded) + 1, np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        columns = {
+            'page': np.full(len(keep), page),
+            'block': np.asarray(data['block_num'])[keep],
+            'par': np.asarray(data['par_num'])[keep],
+            'line': np.asarray(data['line_num'])[keep],
+            'word': np.asarray(data['word_num'])[keep],
+            'left': np.asarray(data['left'])[keep],
+            'top': np.asarray(data['top'])[keep],
+            'width': np.asarray(data['width'])[keep],
+            'height': np.asarray(data['height'])[keep],
+            'conf': conf[keep],
+        }
+        return cls(columns, np.frombuffer(b"".join(encoded), np.uint8), offsets)
+
+    @classmethod
+    def concat(cls, tables):
+        tables = [table for table in tables if len(table)]
+        if not tables:
+            return cls.empty()
+        columns = {name: np.concatenate([t.columns[name] for t in tables]) for name in cls.COLUMNS}
+        starts = np.cumsum([0] + [len(t.text_data) for t in tables[:-1]])
+        offsets = np.concatenate(
+            [[0]] + [t.text_offsets[1:] + start for t, start in zip(tables, starts)])
+        return cls(columns, np.concatenate([t.text_data for t in tables]), offsets)
+
+    def word_text(self, index):
+        start, end = self.text_offsets[index], self.text_offsets[index + 1]
+        return self.text_data[start:end].tobytes().decode('utf-8')
+
+    def words(self):
+        data = self.text_data.tobytes()
+        offsets = self.text_offsets.tolist()
+        return [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(self))]
+
+    def select(self, mask):
+        """
+        Returns the words selected by a boolean mask or index array, in that order.
+        """
+        index = np.flatnonzero(mask) if np.asarray(mask).dtype == bool else np.asarray(mask)
+        lengths = np.diff(self.text_offsets)[index]
+        starts = self.text_offsets[:-1][index]
+        offsets = np.zeros(len(index) + 1, np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # Gather the selected byte ranges in one vectorized pass
+        byte_index = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        columns = {name: column[index] for name, column in self.columns.items()}
+        return WordTable(columns, self.text_data[byte_index], offsets)
+
+    def with_columns(self, **columns):
+        return WordTable({**self.columns, **columns}, self.text_data, self.text_offsets)
+
+    def shifted(self, dx=0, dy=0, page=None):
+        columns = dict(self.columns)
+        columns['left'] = self.left.astype(np.int64) + dx
+        columns['top'] = self.top.astype(np.int64) + dy
+        if page is not None:
+            columns['page'] = np.full(len(self), page, np.uint32)
+        return WordTable(columns, self.text_data, self.text_offsets)
+
+    def scaled(self, factor, factor_y=None):
+        """
+        Returns the words with their boxes scaled by factor (horizontally by factor and
+        vertically by factor_y when given), e.g. back onto a page resampled before OCR.
+        """
+        factor_y = factor if factor_y is None else factor_y
+        columns = dict(self.columns)
+        for name, scale in (('left', factor), ('top', factor_y), ('width', factor), ('height', factor_y)):
+            columns[name] = np.clip(np.rint(self.columns[name] * scale), 0, np.iinfo(np.int32).max)
+        return WordTable(columns, self.text_data, self.text_offsets)
+
+    def boxes(self):
+        return np.column_stack([self.left, self.top, self.width, self.height])
+
+    def mean_confidence(self):
+        return float(self.conf.mean()) if len(self) else None
+
+    def line_starts(self):
+        """
+        Returns boolean masks marking words that start a new line and a new paragraph.
+        """
+        keys = np.column_stack([self.page, self.block, self.par, self.line])
+        new_line = np.ones(len(self), bool)
+        new_line[1:] = np.any(keys[1:] != keys[:-1], axis=1)
+        new_par = np.ones(len(self), bool)
+        new_par[1:] = np.any(keys[1:, :3] != keys[:-1, :3], axis=1)
+        return new_line, new_par
+
+    def line_numbers(self):
+        """
+        Returns the 1-based line of each word in the text() rendering.
+        """
+        if not len(self):
+            return np.zeros(0, np.int64)
+        new_line, new_par = self.line_starts()
+        # Every new line adds one, every new paragraph one more for the blank separator line
+        steps = new_line.astype(np.int64) + new_par
+        steps[0] = 1
+        return np.cumsum(steps)
+
+    def text(self):
+        """
+        Renders the words as plain text: one line per Tesseract line, a blank line between
+        paragraphs and a form feed on its own line between pages.
+        """
+        if not len(self):
+            return ""
+        new_line, new_par = self.line_starts()
+        new_page = np.ones(len(self), bool)
+        new_page[1:] = self.page[1:] != self.page[:-1]
+        parts = []
+        for i, word in enumerate(self.words()):
+            if i:
+                parts.append('\n\f\n' if new_page[i] else '\n\n' if new_par[i] else '\n' if new_line[i] else ' ')
+            parts.append(word)
+        return "".join(parts)
+
+    def save(self, path, compress=False, **extra):
+        """
+        Writes the table (and any extra arrays) to an .npz file.
+        """
+        save = np.savez_compressed if compress else np.savez
+        save(path, text_data=self.text_data, text_offsets=self.text_offsets,
+             **self.columns, **extra)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls({name: data[name] for name in cls.COLUMNS},
+                       data['text_data'], data['text_offsets'])
@@ -1,10 +1,150 @@
 import os
+import time
+import cv2
+import tempfile
+import subprocess
 import pytesseract
 import logging
+import numpy as np
+from collections import deque, Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from config import Config
+from ocr_cache import OCRCache
+from near_duplicates import NearDuplicateIndex
+from ocr_data import WordTable
+import documents
+import layout
+import near_duplicates
+import page_classifier
+import pipeline
+import resolution
+import tiling
+import tracing
+
+# Tesseract version per executable path, looked up once per process
+_tesseract_versions = {}
+
+# Tesseract renderers that process_image_formats can run in one pass
+EXPORT_FORMATS = ('txt', 'hocr', 'tsv', 'pdf')
+
+# Engine and preprocessing owned by a batch worker process, created by _init_worker
+_worker_engine = None
+_worker_preprocess = None
+
+
+def _init_worker(config, omp_threads, preprocess=None):
+    global _worker_engine, _worker_preprocess
+    # Tesseract reads this when the worker spawns it, capping its OpenMP pool
+    os.environ['OMP_THREAD_LIMIT'] = str(omp_threads)
+    tracing.tracer.reset()
+    tracing.configure(config)
+    _worker_engine = OCREngine(config)
+    # Unpickled once per process, so its scratch buffers are reused for every page
+    _worker_preprocess = preprocess
+
+
+def _prepare_image(image, preprocess=None, max_dpi=None, gray=True):
+    # Returns the page (converted to grayscale unless gray is False) and the factor it was
+    # reduced by while decoding
+    reduction = 1
+    if isinstance(image, documents.PageRef):
+        image, reduction = documents.load_page_reduced(image.document, image.page, max_dpi)
+    elif isinstance(image, str):
+        reduction = resolution.decode_reduction(image, max_dpi)
+        image = pipeline.load_image(image, reduction)
+    if isinstance(preprocess, pipeline.Pipeline) and _worker_engine._needs_tiling(image):
+        # Oversized pages are cleaned up strip by strip, like they are recognized
+        page_steps, strip_steps = preprocess.split_for_tiles()
+        image = page_steps.run(image)
+        if strip_steps is not None:
+            config = _worker_engine.config
+            image = tiling.preprocess_tiled(image, strip_steps, config.tile_height,
+                                            config.tile_overlap, config.tile_workers)
+    elif preprocess is not None:
+        image = preprocess(image)
+    return pipeline.to_gray(image) if gray else image, reduction
+
+
+def _ocr_worker(images, output='text', submitted=None, box_scales=None):
+    if submitted is not None:
+        tracing.record('queue_wait.ocr_pool', time.time() - submitted)
+    preprocess = _worker_preprocess
+    try:
+        # Exports keep each page's own resolution and colours, for the searchable PDF
+        exporting = output == 'formats'
+        max_dpi = None if exporting else _worker_engine.config.decode_max_dpi
+        prepared = [_prepare_image(image, preprocess, max_dpi, gray=not exporting) for image in images]
+        images = [image for image, _ in prepared]
+        if output == 'words':
+            # Boxes are reported in the pixel coordinates of the files, whatever they were decoded at
+            box_scales = box_scales or [1] * len(images)
+            results = [_worker_engine.process_image_data(image, box_scale=reduction * box_scale)
+                       for (image, reduction), box_scale in zip(prepared, box_scales)]
+        elif output == 'formats':
+            results = [_worker_engine.process_image_formats(image) for image in images]
+        elif len(images) == 1:
+            results = [_worker_engine.process_image(images[0])]
+        else:
+            results = _worker_engine.process_many(images)
+    finally:
+        # Worker processes exit without running atexit handlers
+        tracing.tracer.flush()
+    # Timings and pixel counts travel back with the results so the parent can report totals for the whole pool
+    resampled = Counter(_worker_engine.resampled)
+    _worker_engine.resampled.clear()
+    return results, tracing.tracer.snapshot(reset=True), resampled
+
+
+def _page_text(words):
+    # Text as Tesseract prints a page: its lines, then the form feed that separates pages
+    return words.text() + "\n\f" if len(words) else page_classifier.EMPTY_PAGE_TEXT
+
+
+def encode_pnm(image):
+    """
+    Wraps 8-bit pixels in a binary PGM (grayscale) or PPM (colour) header.
+
+    The result is the raw pixel buffer plus a few header bytes, so building it costs one
+    copy instead of a compression pass.
+    """
+    if image.dtype != np.uint8:
+        image = cv2.convertScaleAbs(image)
+    if image.ndim == 3 and image.shape[2] == 1:
+        image = image[:, :, 0]
+    if image.ndim == 2:
+        magic = b"P5"
+    else:
+        code = cv2.COLOR_BGRA2RGB if image.shape[2] == 4 else cv2.COLOR_BGR2RGB
+        image = cv2.cvtColor(image, code)
+        magic = b"P6"
+    height, width = image.shape[:2]
+    return b"%s\n%d %d\n255\n" % (magic, width, height) + np.ascontiguousarray(image).tobytes()
+
+
+def _chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
 class OCREngine:
-    def __init__(self,config:Config):
+    def __init__(self,config:Config, use_cache=True):
         self.config = config
+        self.cache = None
+        if use_cache and config.cache_path:
+            self.cache = OCRCache.from_config(config)
+        self.duplicates = None
+        if use_cache and config.near_duplicates and config.near_duplicate_path:
+            self.duplicates = NearDuplicateIndex.from_config(config)
+        # Pages answered without Tesseract, by page_classifier kind
+        self.skipped = Counter()
+        # Pages and pixels before and after resolution normalization
+        self.resampled = Counter()
     
     def process_image(self,image):
         """
@@ -12,26 +152,529 @@ class OCREngine:
         """
         logger = logging.getLogger(__name__)
         try:
-            # Configure Tesseract path
-            pytesseract.tesseract_cmd = self.config.tesseract_path
-            if not os.path.isfile(pytesseract.tesseract_cmd):
-                raise FileNotFoundError(
-                    f"Tesseract executable not found at: {pytesseract.tesseract_cmd}\n"
-                    f"1. Install Tesseract from https://github.com/UB-Mannheim/tesseract/wiki\n"
-                    f"2. Set TESSERACT_PATH in .env or system environment variables"
+            self._configure_tesseract()
+            if self._skip_page(image):
+                return page_classifier.EMPTY_PAGE_TEXT
+            match, page_signature = self._find_duplicate(image)
+            if match is not None:
+                return match.text
+            text = self._recognize(self._normalize(image)[0])
+            self._remember(page_signature, text)
+            return text
+
+        except Exception as e:
+            logger.error(f"Error during OCR processing: {e}")
+            raise
+
+    def _recognize(self, image):
+        if self._needs_tiling(image):
+            return self.process_tiled(image)
+        if self.config.region_ocr and isinstance(image, np.ndarray):
+            return self.process_regions(image)
+        logger = logging.getLogger(__name__)
+        cache_key = self._cache_key(image)
+        if cache_key is not None:
+            text = self.cache.get(cache_key)
+            if text is not None:
+                logger.debug("OCR cache hit")
+                return text
+        logger.info("OCR started")
+
+        # Perform OCR with configured parameters
+        text = self._image_to_string(image)
+        if cache_key is not None:
+            self.cache.put(cache_key, text)
+        return text
+
+    def process_tiled(self, image):
+        """
+        Performs OCR on an oversized page as overlapping strips recognized in parallel.
+
+        Words in the overlaps are kept only by the strip owning their centre, and text blocks
+        that continue across strips are joined so the text reads as for the whole page.
+        """
+        logger = logging.getLogger(__name__)
+        try:
+            self._configure_tesseract()
+            gray = pipeline.to_gray(image)
+            cache_key = self._cache_key(gray, kind='tiled')
+            if cache_key is not None:
+                text = self.cache.get(cache_key)
+                if text is not None:
+                    logger.debug("OCR cache hit")
+                    return text
+            text = _page_text(self._tiled_words(gray))
+            if cache_key is not None:
+                self.cache.put(cache_key, text)
+            return text
+
+        except Exception as e:
+            logger.error(f"Error during tiled OCR processing: {e}")
+            raise
+
+    def process_regions(self, image):
+        """
+        Performs OCR on the text blocks found by layout analysis only, each with a page
+        segmentation mode suited to it and in parallel, and joins them in reading order.
+        Pages where the blocks cover most of the page are recognized whole.
+        """
+        logger = logging.getLogger(__name__)
+        try:
+            self._configure_tesseract()
+            gray = pipeline.to_gray(image)
+            cache_key = self._cache_key(gray, kind='regions')
+            if cache_key is not None:
+                text = self.cache.get(cache_key)
+                if text is not None:
+                    logger.debug("OCR cache hit")
+                    return text
+            words = self._region_words(gray)
+            text = _page_text(words) if words is not None else self._image_to_string(gray)
+            if cache_key is not None:
+                self.cache.put(cache_key, text)
+            return text
+
+        except Exception as e:
+            logger.error(f"Error during region OCR processing: {e}")
+            raise
+
+    def process_image_data(self, image, page=0, box_scale=1):
+        """
+        Performs OCR and returns word-level results (boxes, confidences, block/line/word ids)
+        as a WordTable. Oversized pages are recognized in tiles.
+
+        The boxes are multiplied by box_scale, e.g. the factor the page was reduced by while
+        decoding; it is combined with the resolution normalization so boxes are rounded once.
+        """
+        logger = logging.getLogger(__name__)
+        try:
+            self._configure_tesseract()
+            if self._skip_page(image):
+                return WordTable.empty()
+            match, page_signature = self._find_duplicate(image, need_words=True)
+            if match is not None:
+                words = match.words.scaled(box_scale) if box_scale != 1 else match.words
+            else:
+                logger.info("Word-level OCR started")
+                image, scale = self._normalize(image)
+                words = None
+                if self._needs_tiling(image):
+                    words = self._tiled_words(pipeline.to_gray(image))
+                elif self.config.region_ocr and isinstance(image, np.ndarray):
+                    words = self._region_words(pipeline.to_gray(image))
+                if words is None:
+                    words = self._image_to_data(image)
+                if page_signature is not None:
+                    # The index keeps boxes on the page as it was passed in
+                    self._remember(page_signature, _page_text(words),
+                                   words.scaled(1 / scale) if scale != 1.0 else words)
+                if box_scale / scale != 1.0:
+                    words = words.scaled(box_scale / scale)
+            return words.shifted(page=page) if page else words
+
+        except Exception as e:
+            logger.error(f"Error during word-level OCR processing: {e}")
+            raise
+
+    def process_image_formats(self, image, formats=None):
+        """
+        Runs Tesseract once on a page and returns {extension: bytes} for each requested format
+        (default Config.export_formats). Tesseract renders text, hOCR, TSV and a searchable PDF
+        from the same recognition, so every extra format costs only its rendering.
+
+        The page classifier, region OCR and the caches do not apply: every format, the PDF
+        above all, needs Tesseract's view of the whole page. The page is an image array or the
+        path of an image file, which Tesseract reads itself.
+        """
+        logger = logging.getLogger(__name__)
+        formats = list(formats or self.config.export_formats)
+        unknown = [extension for extension in formats if extension not in EXPORT_FORMATS]
+        if unknown:
+            raise ValueError(f"Unknown output formats {unknown}, expected some of {EXPORT_FORMATS}")
+        try:
+            self._configure_tesseract()
+            with tempfile.TemporaryDirectory(prefix="ocr_export_") as tmp_dir:
+                output_base = os.path.join(tmp_dir, "page")
+                source, data = (image, None) if isinstance(image, str) else ('stdin', encode_pnm(image))
+                cmd = [self.config.tesseract_path, source, output_base, '-l', self.config.language,
+                       '--psm', str(self.config.psm), '--oem', str(self.config.oem), *formats]
+                with tracing.span('tesseract', formats=len(formats)):
+                    result = subprocess.run(cmd, input=data, capture_output=True,
+                                            creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+                if result.returncode != 0:
+                    raise pytesseract.TesseractError(
+                        result.returncode, result.stderr.decode('utf-8', 'replace').strip())
+                outputs = {}
+                for extension in formats:
+                    with open(f"{output_base}.{extension}", 'rb') as f:
+                        outputs[extension] = f.read()
+            return outputs
+
+        except Exception as e:
+            logger.error(f"Error during multi-format OCR: {e}")
+            raise
+
+    def _ocr_settings(self):
+        # Everything besides the pixels that changes what Tesseract returns for a page
+        return (self.config.language, self.config.psm, self.config.oem, self.tesseract_version(),
+                self.config.region_ocr, self.config.normalize_resolution)
+
+    def _find_duplicate(self, image, need_words=False):
+        """
+        Looks the page up in the near-duplicate index. Returns (match, signature); match is
+        None when no stored page passes verification, signature None when the index is off.
+        """
+        if self.duplicates is None or not isinstance(image, np.ndarray):
+            return None, None
+        with tracing.span('near_duplicate'):
+            page_signature = near_duplicates.signature(pipeline.to_gray(image))
+            match = self.duplicates.find(page_signature, self._ocr_settings(), need_words)
+        if match is not None:
+            tracing.record('reused.near_duplicate', 0.0)
+            logging.getLogger(__name__).info(
+                f"Reusing the OCR result of near-duplicate page {match.page_id} "
+                f"({match.distance} bits apart)")
+        return match, page_signature
+
+    def _remember(self, page_signature, text, words=None):
+        if page_signature is not None:
+            self.duplicates.add(page_signature, self._ocr_settings(), text, words)
+
+    def _normalize(self, image):
+        """
+        Resamples the page so its text is Config.normalize_text_height pixels high, counting
+        pages and pixels before and after in self.resampled. Returns (image, scale); the image
+        is returned unchanged with scale 1.0 when it needs no resampling.
+        """
+        if not self.config.normalize_resolution or not isinstance(image, np.ndarray):
+            return image, 1.0
+        with tracing.span('normalize'):
+            gray = pipeline.to_gray(image)
+            found = resolution.text_scale_from_config(gray, self.config)
+            resampled = image if found.scale == 1.0 else resolution.resample(gray, found.scale)
+        self.resampled['pages'] += 1
+        self.resampled['pixels_in'] += image.shape[0] * image.shape[1]
+        self.resampled['pixels_out'] += resampled.shape[0] * resampled.shape[1]
+        if found.scale != 1.0:
+            self.resampled['resampled'] += 1
+            logging.getLogger(__name__).debug(
+                f"Resampled page by {found.scale:.2f} for text {found.text_height:.1f} px high: "
+                f"{image.shape[1]}x{image.shape[0]} to {resampled.shape[1]}x{resampled.shape[0]}")
+        return resampled, found.scale
+
+    def _skip_page(self, image):
+        """
+        Returns True when the page classifier finds the page blank or without text, counting it
+        in self.skipped and in the skipped.<kind> tracing stage.
+        """
+        if not self.config.skip_blank_pages or not isinstance(image, np.ndarray):
+            return False
+        with tracing.span('classify'):
+            page = page_classifier.classify_from_config(pipeline.to_gray(image), self.config)
+        if page.kind == page_classifier.TEXT:
+            return False
+        self.skipped[page.kind] += 1
+        tracing.record(f'skipped.{page.kind}', 0.0)
+        logging.getLogger(__name__).info(
+            f"Skipping OCR for {page.kind} page (ink {page.ink_ratio:.4f}, "
+            f"{page.text_components} text-like components)")
+        return True
+
+    def _tiled_words(self, gray):
+        return tiling.ocr_tiled(gray, self._image_to_data, self.config.tile_height,
+                                self.config.tile_overlap, self.config.tile_workers)
+
+    def _region_words(self, gray):
+        """
+        Returns the words of the page's text regions in reading order, one block per region,
+        or None when whole-page OCR is the better choice: no regions, too many of them, or
+        regions covering most of the page.
+        """
+        logger = logging.getLogger(__name__)
+        with tracing.span('layout'):
+            regions = layout.detect_text_regions(gray, self.config.layout_max_side,
+                                                 self.config.skip_page_ink_contrast)
+        area = sum((r.right - r.left) * (r.bottom - r.top) for r in regions)
+        if (not regions or len(regions) > self.config.region_max_count
+                or area > self.config.region_max_coverage * gray.size):
+            logger.debug(f"Whole-page OCR: {len(regions)} regions covering {area / gray.size:.0%}")
+            return None
+        logger.info(f"Region OCR of {len(regions)} text blocks covering {area / gray.size:.0%} of the page")
+
+        # Regions sharing a PSM go to Tesseract together as a multi-page list file, one
+        # invocation per worker, so process startup is not paid once per region
+        workers = min(len(regions), self.config.region_workers or os.cpu_count() or 1)
+        batches = []
+        for psm in sorted({region.psm for region in regions}):
+            indexes = [i for i, region in enumerate(regions) if region.psm == psm]
+            indexes.sort(key=lambda i: -(regions[i].right - regions[i].left) * (regions[i].bottom - regions[i].top))
+            batches.extend((psm, indexes[part::workers]) for part in range(min(workers, len(indexes))))
+
+        def recognize(batch):
+            psm, indexes = batch
+            crops = [gray[regions[i].top:regions[i].bottom, regions[i].left:regions[i].right] for i in indexes]
+            return self._run_image_list(crops, 'tsv', psm)
+
+        tables = [None] * len(regions)
+        with ThreadPoolExecutor(max_workers=min(workers, len(batches)), thread_name_prefix="region") as pool:
+            for (_, indexes), batch_tables in zip(batches, pool.map(recognize, batches)):
+                for i, words in zip(indexes, batch_tables):
+                    tables[i] = words.shifted(dx=regions[i].left, dy=regions[i].top)
+        # Tesseract numbers blocks per call; renumber so each region is one block
+        renumbered = []
+        for block, words in enumerate(tables, start=1):
+            new_line, new_par = words.line_starts()
+            renumbered.append(words.with_columns(
+                block=np.full(len(words), block), par=np.cumsum(new_par), line=np.cumsum(new_line)))
+        return WordTable.concat(renumbered)
+
+    def _needs_tiling(self, image):
+        threshold = self.config.tile_threshold_pixels
+        return (threshold is not None and isinstance(image, np.ndarray)
+                and image.shape[0] * image.shape[1] > threshold)
+
+    @tracing.traced('tesseract')
+    def _image_to_string(self, image):
+        if self._use_pipe(image):
+            return self._run_pipe(image)
+        return pytesseract.image_to_string(
+            image,
+            lang=self.config.language,
+            config=f'--psm {self.config.psm} --oem {self.config.oem}'
+        )
+
+    def _image_to_data(self, image, psm=None):
+        psm = psm or self.config.psm
+        with tracing.span('tesseract'):
+            if self._use_pipe(image):
+                text = self._run_pipe(image, 'tsv', psm)
+            else:
+                text = pytesseract.image_to_data(
+                    image,
+                    lang=self.config.language,
+                    config=f'--psm {psm} --oem {self.config.oem}'
                 )
-            logger.info("OCR started")
-            # # Verify Tesseract accessibility
-            # tesseract_version = pytesseract.get_tesseract_version()
-            # logger.debug(f"Tesseract version: {tesseract_version}")
-
-            # Perform OCR with configured parameters
-            return pytesseract.image_to_string(
-                image,
-                lang=self.config.language,
-                config=f'--psm {self.config.psm} --oem {self.config.oem}'
+        with tracing.span('result.parse'):
+            return WordTable.from_tesseract(pytesseract.pytesseract.file_to_dict(text, '\t', -1))
+
+    def _use_pipe(self, image):
+        # Only pixel arrays can be streamed; paths and PIL images go through pytesseract
+        return self.config.tesseract_transport == 'pipe' and isinstance(image, np.ndarray)
+
+    def _run_pipe(self, image, extension='txt', psm=None):
+        """
+        Runs Tesseract on an image array sent as raw PNM over stdin and reads the result from
+        stdout, without encoding a compressed temporary file or touching the disk.
+        """
+        cmd = [self.config.tesseract_path, 'stdin', 'stdout', '-l', self.config.language,
+               '--psm', str(psm or self.config.psm), '--oem', str(self.config.oem)]
+        if extension != 'txt':
+            cmd.append(extension)
+        result = subprocess.run(cmd, input=encode_pnm(image), capture_output=True,
+                                creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+        if result.returncode != 0:
+            raise pytesseract.TesseractError(
+                result.returncode, result.stderr.decode('utf-8', 'replace').strip())
+        return result.stdout.decode('utf-8')
+
+    def _configure_tesseract(self):
+        pytesseract.pytesseract.tesseract_cmd = self.config.tesseract_path
+        if not self.config.tesseract_path or not os.path.isfile(self.config.tesseract_path):
+            raise FileNotFoundError(
+                f"Tesseract executable not found at: {self.config.tesseract_path}\n"
+                f"1. Install Tesseract from https://github.com/UB-Mannheim/tesseract/wiki\n"
+                f"2. Set TESSERACT_PATH in .env or system environment variables"
             )
 
+    def tesseract_version(self):
+        cmd = self.config.tesseract_path
+        if cmd not in _tesseract_versions:
+            self._configure_tesseract()
+            _tesseract_versions[cmd] = str(pytesseract.get_tesseract_version())
+            logging.getLogger(__name__).debug(f"Tesseract version: {_tesseract_versions[cmd]}")
+        return _tesseract_versions[cmd]
+
+    def _cache_key(self, image, kind='text'):
+        # Only decoded pixel buffers are content-addressable
+        if self.cache is None or not isinstance(image, np.ndarray):
+            return None
+        settings = (kind, self.config.language, self.config.psm, self.config.oem,
+                    self.tesseract_version())
+        return OCRCache.make_key(image, settings)
+
+    def process_many(self, images):
+        """
+        Performs OCR on several images with a single Tesseract invocation and returns one text per image.
+
+        The images are listed in a file that Tesseract reads as a multi-page input, so process
+        startup and language model loading are paid once for the whole list. The combined output
+        is split back into pages on Tesseract's form-feed page separator.
+        """
+        logger = logging.getLogger(__name__)
+        try:
+            self._configure_tesseract()
+            results = [page_classifier.EMPTY_PAGE_TEXT if self._skip_page(image) else None
+                       for image in images]
+            signatures = [None] * len(images)
+            for idx, image in enumerate(images):
+                if results[idx] is None:
+                    match, signatures[idx] = self._find_duplicate(image)
+                    if match is not None:
+                        results[idx] = match.text
+            if self.config.region_ocr:
+                # Each page's regions are batched per PSM within the page, so pages are not
+                # combined into one list file
+                for idx, image in enumerate(images):
+                    if results[idx] is None:
+                        results[idx] = self._recognize(self._normalize(image)[0])
+                        self._remember(signatures[idx], results[idx])
+                return results
+            images = [image if text is not None else self._normalize(image)[0]
+                      for image, text in zip(images, results)]
+            cache_keys = [None if text is not None else self._cache_key(image)
+                          for image, text in zip(images, results)]
+            for idx, cache_key in enumerate(cache_keys):
+                if cache_key is not None:
+                    results[idx] = self.cache.get(cache_key)
+            missing = [idx for idx, text in enumerate(results) if text is None]
+            if not missing:
+                return results
+
+            logger.info(f"OCR started for {len(missing)} images in one invocation")
+            texts = self._run_image_list([images[idx] for idx in missing])
+            for idx, text in zip(missing, texts):
+                results[idx] = text
+                if cache_keys[idx] is not None:
+                    self.cache.put(cache_keys[idx], text)
+                self._remember(signatures[idx], text)
+            return results
+
         except Exception as e:
-            logger.error(f"Error during OCR processing: {e}")
+            logger.error(f"Error during batched OCR processing: {e}")
             raise
+
+    def _run_image_list(self, images, extension='txt', psm=None):
+        """
+        Runs one Tesseract invocation over a list file of images. Returns one text per image,
+        or one WordTable per image with extension='tsv'.
+        """
+        config = f'--psm {psm or self.config.psm} --oem {self.config.oem}'
+        if extension == 'tsv':
+            config += ' -c tessedit_create_tsv=1'
+        with tempfile.TemporaryDirectory(prefix="ocr_batch_") as tmp_dir:
+            image_paths = []
+            for idx, image in enumerate(images):
+                if isinstance(image, str):
+                    image_paths.append(os.path.abspath(image))
+                    continue
+                if self.config.tesseract_transport == 'pipe':
+                    # Uncompressed PNM: writing it is a plain copy of the pixels
+                    path = os.path.join(tmp_dir, f"page_{idx:05d}.pnm")
+                    with open(path, 'wb') as f:
+                        f.write(encode_pnm(image))
+                else:
+                    path = os.path.join(tmp_dir, f"page_{idx:05d}.png")
+                    cv2.imwrite(path, image, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+                image_paths.append(path)
+
+            list_path = os.path.join(tmp_dir, "images.txt")
+            with open(list_path, 'w', encoding='utf-8') as f:
+                f.write("\n".join(image_paths) + "\n")
+
+            output_base = os.path.join(tmp_dir, "output")
+            with tracing.span('tesseract', images=len(images)):
+                pytesseract.pytesseract.run_tesseract(
+                    list_path, output_base, extension=extension,
+                    lang=self.config.language, config=config
+                )
+            with open(f"{output_base}.{extension}", encoding='utf-8') as f:
+                text = f.read()
+
+        if extension == 'tsv':
+            with tracing.span('result.parse'):
+                data = pytesseract.pytesseract.file_to_dict(text, '\t', -1)
+                page_numbers = np.asarray(data.get('page_num', []), int)
+                tables = []
+                for page in range(1, len(images) + 1):
+                    rows = np.flatnonzero(page_numbers == page)
+                    tables.append(WordTable.from_tesseract(
+                        {key: [values[i] for i in rows] for key, values in data.items()}))
+            return tables
+
+        pages = text.split('\f')[:len(images)]
+        if len(pages) != len(images):
+            raise RuntimeError(
+                f"Tesseract returned {len(pages)} pages for {len(images)} images")
+        # Match image_to_string, which keeps the trailing page separator
+        return [page + '\f' for page in pages]
+
+    def process_batch(self, images, workers=None, ordered=True, max_in_flight=None,
+                      omp_threads=None, preprocess=None, chunk_size=None, output='text', box_scales=None):
+        """
+        Runs OCR over many images on a process pool and yields (index, text) pairs.
+
+        Images may be arrays, file paths or documents.PageRef; paths and page references are
+        decoded inside the workers. With ordered=True results come back in input order,
+        otherwise as they complete. At most max_in_flight chunks are queued at once, so long inputs are consumed lazily. Each
+        worker limits Tesseract to omp_threads OpenMP threads so the pool does not
+        oversubscribe the CPU. With chunk_size > 1 each worker sends a whole chunk through
+        process_many. With output='words' each result is a WordTable instead of text, and with
+        output='formats' the dictionary of process_image_formats. Items that fail are logged
+        and yielded with None. box_scales optionally maps an item's index to the box_scale of
+        process_image_data; it is read as each item is submitted, so a generator of images may
+        fill it in as it goes.
+        """
+        logger = logging.getLogger(__name__)
+        cpu_count = os.cpu_count() or 1
+        workers = workers or self.config.ocr_workers or cpu_count
+        max_in_flight = max_in_flight or workers * 2
+        omp_threads = omp_threads or max(1, cpu_count // workers)
+        chunk_size = chunk_size or self.config.ocr_chunk_size
+        logger.info(f"Batch OCR with {workers} workers, {omp_threads} OpenMP threads each, "
+                    f"{chunk_size} images per invocation")
+
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(self.config, omp_threads, preprocess))
+
+        def submit(chunk):
+            indexes = [index for index, _ in chunk]
+            scales = [box_scales.get(index, 1) for index in indexes] if box_scales else None
+            future = pool.submit(_ocr_worker, [image for _, image in chunk], output,
+                                 time.time(), scales)
+            return indexes, future
+
+        try:
+            chunks = _chunked(enumerate(images), chunk_size)
+            if ordered:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(submit(chunk))
+                    if len(pending) >= max_in_flight:
+                        yield from self._batch_results(*pending.popleft())
+                while pending:
+                    yield from self._batch_results(*pending.popleft())
+            else:
+                in_flight = {}
+                for chunk in chunks:
+                    indexes, future = submit(chunk)
+                    in_flight[future] = indexes
+                    if len(in_flight) >= max_in_flight:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield from self._batch_results(in_flight.pop(future), future)
+                while in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from self._batch_results(in_flight.pop(future), future)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _batch_results(self, indexes, future):
+        try:
+            texts, timings, resampled = future.result()
+            tracing.tracer.merge(timings)
+            self.resampled.update(resampled)
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Batch OCR failed for items {indexes}: {e}")
+            texts = [None] * len(indexes)
+        yield from zip(indexes, texts)
@@ -0,0 +1,300 @@
+import os
+import time
+import cv2
+import numpy as np
+import logging
+import deskew
+import tracing
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp')
+
+
+# cv2.imread flags decoding at 1/n size, e.g. through JPEG's scaled DCT
+_REDUCED_READ_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def load_image(image_path, reduce=1):
+    """
+    Reads an image from disk as a BGR array, at 1/reduce of its size (1, 2, 4 or 8).
+    """
+    with tracing.span('decode'):
+        image = cv2.imread(image_path, _REDUCED_READ_FLAGS[reduce])
+    if image is None:
+        raise FileNotFoundError(f"Could not load image at path: {image_path}")
+    return image
+
+
+def to_gray(image):
+    if image.ndim == 2:
+        return image
+    with tracing.span('color_convert'):
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def rotate_image(image, angle):
+    (h, w) = image.shape[:2]
+    center = (w // 2, h // 2)
+    M = cv2.getRotationMatrix2D(center, angle, 1.0)
+    return cv2.warpAffine(image, M, (w, h))
+
+
+def crop_box(width, height, x1, y1, x2, y2):
+    """
+    Clamps a crop box to an image of the given size; returns None for an empty box.
+    """
+    x1, x2 = sorted([max(0, min(x1, width)), max(0, min(x2, width))])
+    y1, y2 = sorted([max(0, min(y1, height)), max(0, min(y2, height))])
+    if x2 > x1 and y2 > y1:
+        return x1, y1, x2, y2
+    return None
+
+
+def crop_image(image, x1, y1, x2, y2):
+    """
+    Crops to the given box, clamped to the image bounds. Returns the image unchanged for an empty box.
+    """
+    h, w = image.shape[:2]
+    box = crop_box(w, h, x1, y1, x2, y2)
+    if box is None:
+        return image
+    x1, y1, x2, y2 = box
+    return image[y1:y2, x1:x2]
+
+
+def output_size(name, params, size):
+    """
+    Returns the (width, height) an operation produces from an image of the given size.
+    """
+    if name == 'crop':
+        box = crop_box(*size, **params)
+        if box is not None:
+            x1, y1, x2, y2 = box
+            return x2 - x1, y2 - y1
+    return size
+
+
+def adjust_contrast(image, alpha):
+    return cv2.convertScaleAbs(image, alpha=alpha, beta=0)
+
+
+def binarize_image(image):
+    _, binary = cv2.threshold(to_gray(image), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if image.ndim == 2:
+        return binary
+    return cv2.cvtColor(binary, cv2.COLOR_GRAY2BGR)
+
+
+def estimate_skew_angle(gray):
+    """
+    Estimates the page skew correction in degrees; returns 0.0 when none can be found.
+    """
+    angle, method = deskew.estimate_skew(gray)
+    logging.getLogger(__name__).debug(f"Skew {angle:.2f} deg via {method}")
+    return angle
+
+
+def rotation_matrix(image, angle):
+    (h, w) = image.shape[:2]
+    center = (w//2, h//2)
+    return cv2.getRotationMatrix2D(center, angle, 1.0)
+
+
+def deskew_image(image, angle=None):
+    """
+    Straightens the page, estimating the skew angle unless one is given.
+    """
+    if angle is None:
+        angle = estimate_skew_angle(to_gray(image))
+    if angle == 0.0:
+        return image
+    (h, w) = image.shape[:2]
+    return cv2.warpAffine(image, rotation_matrix(image, angle), (w, h), flags=cv2.INTER_CUBIC,
+                          borderMode=cv2.BORDER_REPLICATE)
+
+
+# Operations addressable by name, shared by the GUI editor and headless pipelines
+OPERATIONS = {
+    'rotate': rotate_image,
+    'crop': crop_image,
+    'contrast': adjust_contrast,
+    'binarize': binarize_image,
+    'deskew': deskew_image,
+}
+
+
+class Pipeline:
+    """
+    Ordered list of named image operations applied to every page, without any GUI.
+
+    An optional AutoPreprocessor runs after the named operations.
+    """
+    def __init__(self, steps=None, auto=None):
+        self.steps = []
+        self.auto = auto
+        self._split = None
+        for name, params in steps or []:
+            self.add(name, **params)
+
+    def add(self, name, **params):
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown preprocessing operation: {name}")
+        self.steps.append((name, params))
+        self._split = None
+        return self
+
+    def run(self, image):
+        for name, params in self.steps:
+            with tracing.span(f'preprocess.{name}'):
+                image = OPERATIONS[name](image, **params)
+        if self.auto is not None:
+            image = self.auto.run(image)
+        return image
+
+    __call__ = run
+
+    def split_for_tiles(self):
+        """
+        Splits the pipeline for a page preprocessed in strips (tiling.preprocess_tiled) and
+        returns (page, strip). The named operations and automatic deskew need the whole page and
+        stay in page; the automatic cleanup stages only look at a neighbourhood of each pixel and
+        go to strip, which is None when there are none. Deskew then runs before the cleanup
+        instead of after it.
+        """
+        if self.auto is None:
+            return self, None
+        if self._split is None:
+            # Built once, so the split preprocessors keep their scratch buffers between pages
+            local = [stage for stage in self.auto.stages if stage != 'deskew']
+            page_auto = AutoPreprocessor(self.auto.config, ['deskew']) if 'deskew' in self.auto.stages else None
+            strip = Pipeline(auto=AutoPreprocessor(self.auto.config, local)) if local else None
+            self._split = (Pipeline(self.steps, page_auto), strip)
+        return self._split
+
+
+class AutoPreprocessor:
+    """
+    Runs the Config-driven cleanup stages (denoise, CLAHE, adaptive threshold, deskew) on a page.
+
+    Intermediate results ping-pong between two scratch buffers that are reused while the page
+    size stays the same; only the final stage writes into a freshly allocated grayscale array.
+    Time spent in each stage is accumulated so expensive stages can be dropped on clean scans.
+    """
+    STAGES = ('denoise', 'clahe', 'adaptive_threshold', 'deskew')
+
+    def __init__(self, config, stages=None):
+        self.config = config
+        self.stages = list(config.auto_preprocess_stages if stages is None else stages)
+        for stage in self.stages:
+            if stage not in self.STAGES:
+                raise ValueError(f"Unknown automatic preprocessing stage: {stage}")
+        clahe = config.clahe_params
+        self._clahe_filter = cv2.createCLAHE(clipLimit=clahe['clip_limit'],
+                                             tileGridSize=tuple(clahe['tile_grid_size']))
+        self._scratch = ()
+        self.stage_times = {stage: 0.0 for stage in ('grayscale',) + tuple(self.stages)}
+        self.pages = 0
+
+    def __getstate__(self):
+        # CLAHE objects and scratch buffers are per process; rebuild them after unpickling
+        return {'config': self.config, 'stages': self.stages}
+
+    def __setstate__(self, state):
+        self.__init__(state['config'], state['stages'])
+
+    def _scratch_for(self, shape):
+        if not self._scratch or self._scratch[0].shape != shape:
+            self._scratch = (np.empty(shape, np.uint8), np.empty(shape, np.uint8))
+        return self._scratch
+
+    def run(self, image):
+        scratch = self._scratch_for(image.shape[:2])
+        last = len(self.stages) - 1
+
+        start = time.perf_counter()
+        src = np.empty(image.shape[:2], np.uint8) if last < 0 else scratch[1]
+        if image.ndim == 3:
+            cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=src)
+        else:
+            np.copyto(src, image)
+        elapsed = time.perf_counter() - start
+        self.stage_times['grayscale'] += elapsed
+        tracing.record('color_convert', elapsed)
+
+        for idx, stage in enumerate(self.stages):
+            start = time.perf_counter()
+            dst = np.empty_like(src) if idx == last else scratch[idx % 2]
+            getattr(self, f"_{stage}")(src, dst)
+            elapsed = time.perf_counter() - start
+            self.stage_times[stage] += elapsed
+            tracing.record(f'auto.{stage}', elapsed)
+            src = dst
+        self.pages += 1
+        return src
+
+    def _denoise(self, src, dst):
+        params = self.config.denoise_params
+        cv2.fastNlMeansDenoising(src, dst, params['h'], params['template_window_size'],
+                                 params['search_window_size'])
+
+    def _clahe(self, src, dst):
+        self._clahe_filter.apply(src, dst)
+
+    def _adaptive_threshold(self, src, dst):
+        params = self.config.adaptive_thresh_params
+        cv2.adaptiveThreshold(src, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+                              params['block_size'], params['c'], dst)
+
+    def _deskew(self, src, dst):
+        angle = estimate_skew_angle(src)
+        if angle == 0.0:
+            np.copyto(dst, src)
+            return
+        (h, w) = src.shape[:2]
+        cv2.warpAffine(src, rotation_matrix(src, angle), (w, h), dst, cv2.INTER_CUBIC,
+                       cv2.BORDER_REPLICATE)
+
+    def stage_report(self):
+        """
+        Returns per-stage totals, per-page means in milliseconds and share of the preprocessing time.
+        """
+        total = sum(self.stage_times.values()) or 1.0
+        pages = self.pages or 1
+        return [
+            {
+                'stage': stage,
+                'total_ms': seconds * 1000,
+                'mean_ms': seconds * 1000 / pages,
+                'share': seconds / total,
+            }
+            for stage, seconds in self.stage_times.items()
+        ]
+
+    def format_report(self):
+        lines = [f"{'stage':<20}{'total ms':>12}{'ms/page':>10}{'share':>8}"]
+        for row in self.stage_report():
+            lines.append(f"{row['stage']:<20}{row['total_ms']:>12.1f}{row['mean_ms']:>10.2f}"
+                         f"{row['share']:>8.1%}")
+        lines.append(f"{self.pages} pages")
+        return "\n".join(lines)
+
+
+def iter_image_files(directory, recursive=False):
+    """
+    Yields image file paths under a directory in a stable order.
+    """
+    if recursive:
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(root, name)
+    else:
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path) and name.lower().endswith(IMAGE_EXTENSIONS):
+                yield path
@@ -0,0 +1,91 @@
+import cv2
+import pipeline
+import tracing
+
+
+def build_pyramid(image, min_size=(640, 480), max_size=None):
+    """
+    Returns successively halved copies of an image, largest first, stopping before
+    a level would drop below min_size in either orientation, so portrait pages get as many
+    levels as landscape ones. Level 0 is the image itself; halved levels larger
+    than max_size are only computed on the way down, not kept.
+    """
+    levels = [image]
+    level = image
+    min_short, min_long = sorted(min_size)
+    while True:
+        short, long = sorted(level.shape[:2])
+        if short // 2 < min_short or long // 2 < min_long:
+            return levels
+        level = cv2.pyrDown(level)
+        if max_size is None or (level.shape[1] <= max_size[0] and level.shape[0] <= max_size[1]):
+            levels.append(level)
+
+
+class PreviewProxy:
+    """
+    Screen-sized stand-in for a full-resolution image being edited.
+
+    Edits are replayed on the smallest pyramid level that still covers the display, with
+    crop boxes scaled from full-resolution coordinates. The full-resolution size after each
+    operation is tracked analytically, so display coordinates can be mapped back exactly
+    without rendering the full image.
+
+    With max_size (the screen size), only levels that fit on screen are held in memory besides
+    the image itself, which may be a memory map; a display larger than all of them is served
+    from level 0.
+    """
+    def __init__(self, image, min_size=(640, 480), max_size=None):
+        self.levels = build_pyramid(image, min_size, max_size)
+        h, w = image.shape[:2]
+        self.base_size = (w, h)
+        self.level = len(self.levels) - 1
+        self.ops = []
+        self.full_size = self.base_size
+        self.image = self.levels[self.level]
+
+    def select_level(self, width, height):
+        """
+        Picks the smallest level at least width x height, re-rendering if it changed.
+        """
+        level = 0
+        for idx, candidate in enumerate(self.levels):
+            h, w = candidate.shape[:2]
+            if w >= width and h >= height:
+                level = idx
+        if level != self.level:
+            self.level = level
+            self.render(self.ops)
+        return self.image
+
+    def apply(self, name, params):
+        self.image = self._apply(self.image, name, params, self.full_size)
+        self.full_size = pipeline.output_size(name, params, self.full_size)
+        self.ops.append((name, params))
+        return self.image
+
+    def render(self, ops):
+        """
+        Replays a list of (name, params) operations from the selected pyramid level.
+        """
+        image = self.levels[self.level]
+        full_size = self.base_size
+        for name, params in ops:
+            image = self._apply(image, name, params, full_size)
+            full_size = pipeline.output_size(name, params, full_size)
+        self.image = image
+        self.full_size = full_size
+        self.ops = list(ops)
+        return image
+
+    @staticmethod
+    def _apply(image, name, params, full_size):
+        if name == 'crop':
+            h, w = image.shape[:2]
+            sx, sy = w / full_size[0], h / full_size[1]
+            params = {
+                'x1': round(params['x1'] * sx), 'y1': round(params['y1'] * sy),
+                'x2': round(params['x2'] * sx), 'y2': round(params['y2'] * sy),
+            }
+        with tracing.span(f'preview.{name}'):
+            return pipeline.OPERATIONS[name](image, **params)
@@ -0,0 +1,119 @@
+"""
+Resolution normalization: resample each page so its text has the height Tesseract reads best.
+
+Pages arrive at whatever resolution they were scanned or photographed at. A 600 dpi scan makes
+Tesseract process four times the pixels it needs, while the characters of a low-resolution
+phone photo are too small to be recognized reliably. The dominant text height is estimated
+as the median height of the page's glyph-like ink components (see page_classifier), measured
+on a reduced copy so the estimate takes milliseconds, and the page is scaled so that height
+becomes the target. Pages already within tolerance of the target are left alone.
+
+Decoding can be reduced too: when a file's header reports a resolution well above what OCR
+needs, OpenCV's IMREAD_REDUCED_* modes decode it directly at 1/2, 1/4 or 1/8 size (see
+decode_reduction).
+"""
+from collections import namedtuple
+import cv2
+import numpy as np
+from PIL import Image
+import page_classifier
+
+# Fewer glyph-like components than this give no reliable text height
+MIN_GLYPHS = 20
+
+# Scale factors OpenCV can decode at, largest first
+REDUCTIONS = (8, 4, 2)
+
+TextScale = namedtuple('TextScale', ['text_height', 'scale'])
+
+
+def estimate_text_height(gray, max_side=2048, ink_contrast=80, min_glyphs=MIN_GLYPHS):
+    """
+    Returns the median height in pixels of the glyph-like components of a grayscale page, or
+    None when the page has too few of them (photos, blank pages).
+    """
+    small = page_classifier.reduce_page(gray, max_side)
+    factor = gray.shape[0] / small.shape[0]
+    h, w = small.shape[:2]
+    _, _, stats, _ = cv2.connectedComponentsWithStats(
+        page_classifier.ink_mask(small, ink_contrast), connectivity=8)
+    stats = stats[1:]
+    heights = stats[page_classifier.glyph_like(stats, h, w), cv2.CC_STAT_HEIGHT]
+    if len(heights) < min_glyphs:
+        return None
+    return float(np.median(heights)) * factor
+
+
+def text_scale(gray, target_height=30, tolerance=0.25, min_scale=0.25, max_scale=3.0,
+               max_side=2048, ink_contrast=80):
+    """
+    Returns the TextScale that brings the page's text height to target_height pixels. The
+    scale is 1.0 when the text height is unknown or within tolerance (a fraction) of the
+    target, and is otherwise clamped to [min_scale, max_scale].
+    """
+    text_height = estimate_text_height(gray, max_side, ink_contrast)
+    if text_height is None:
+        return TextScale(None, 1.0)
+    scale = target_height / text_height
+    if 1 / (1 + tolerance) <= scale <= 1 + tolerance:
+        return TextScale(text_height, 1.0)
+    return TextScale(text_height, float(np.clip(scale, min_scale, max_scale)))
+
+
+def text_scale_from_config(gray, config):
+    return text_scale(gray, config.normalize_text_height, config.normalize_tolerance,
+                      config.normalize_min_scale, config.normalize_max_scale,
+                      config.normalize_max_side, config.skip_page_ink_contrast)
+
+
+def resample(image, scale):
+    """
+    Resizes an image by scale: area averaging when shrinking, cubic interpolation when enlarging.
+    """
+    if scale == 1.0:
+        return image
+    h, w = image.shape[:2]
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC)
+
+
+def reduction_for_dpi(dpi, max_dpi):
+    """
+    Returns the largest decode reduction that keeps a page of the given resolution at or above
+    max_dpi, or 1.
+    """
+    if not dpi or not max_dpi:
+        return 1
+    for factor in REDUCTIONS:
+        if dpi / factor >= max_dpi:
+            return factor
+    return 1
+
+
+def header_dpi(img):
+    """
+    Returns the smaller of a Pillow image's horizontal and vertical resolution, or None.
+    """
+    dpi = img.info.get('dpi')
+    if not dpi:
+        return None
+    try:
+        # PNG stores pixels per metre, so 600 dpi reads back as 599.9994
+        value = round(min(float(dpi[0]), float(dpi[1])))
+    except (TypeError, ValueError, IndexError):
+        return None
+    # Files without a real resolution often claim 1 or 72 dpi
+    return value if value > 72 else None
+
+
+def decode_reduction(path, max_dpi):
+    """
+    Returns the factor a single-page image can be decoded at, reading only its header.
+    """
+    if not max_dpi:
+        return 1
+    try:
+        with Image.open(path) as img:
+            return reduction_for_dpi(header_dpi(img), max_dpi)
+    except OSError:
+        return 1
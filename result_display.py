@@ -1,17 +1,35 @@
 import tkinter as tk
-from tkinter import ttk, filedialog
+from tkinter import ttk, filedialog, messagebox
 from PIL import Image, ImageTk
 import pytesseract
 import cv2
 import os
+import numpy as np
+import logging
+import documents
+from atomic_write import write_bytes_atomic
+from config import Config
+from ocr_engine import OCREngine
+from scheduler import JobCancelled
 
 class ResultDisplay:
-    def __init__(self, parent, image_path, ocr_text):
+    def __init__(self, parent, image_path, ocr_text, words=None, page=0, image=None, config=None,
+                 decode_reduction=1, scheduler=None):
         self.root = tk.Toplevel(parent)
         self.root.title("OCR Results")
         self.root.state("zoomed")
         
         self.image_path = image_path
+        self.page = page
+        self.config = config or Config()
+        # The app's JobScheduler; exports run on it so the window stays responsive
+        self.scheduler = scheduler
+        # Optional array_store.ArrayRef of the processed page, read only when the window loads
+        self.image_ref = image
+        # Optional ocr_data.WordTable with the boxes behind ocr_text, in the file's pixels
+        self.words = words
+        # How much smaller than the file the stored page image is
+        self.decode_reduction = decode_reduction
         self.original_text = ocr_text
         self.current_text = ocr_text
         self.highlight_tag = None
@@ -39,12 +57,20 @@ class ResultDisplay:
         toolbar = ttk.Frame(self.root)
         toolbar.pack(fill=tk.X)
         ttk.Button(toolbar, text="Save Text", command=self.save_text).pack(side=tk.LEFT)
-        ttk.Button(toolbar, text="Export PDF", command=self.export_pdf).pack(side=tk.LEFT)
+        self.btn_export = ttk.Button(toolbar, text="Export PDF", command=self.export_pdf)
+        self.btn_export.pack(side=tk.LEFT)
         ttk.Button(toolbar, text="Copy", command=self.copy_text).pack(side=tk.RIGHT)
 
     def load_image(self):
-        image = cv2.imread(self.image_path)
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        if self.image_ref is not None:
+            image = self.image_ref.load()
+        else:
+            image = documents.load_page(self.image_path, self.page)
+            self.decode_reduction = 1
+        self.image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB if image.ndim == 2 else cv2.COLOR_BGR2RGB)
+        self.show_image(self.image)
+
+    def show_image(self, image):
         img = Image.fromarray(image)
         img.thumbnail((800, 600))
         self.tk_image = ImageTk.PhotoImage(img)
@@ -61,6 +87,8 @@ class ResultDisplay:
         
         self.text_editor.insert(tk.END, self.current_text)
         self.text_editor.bind("<KeyRelease>", self.update_text)
+        # Clicking a word outlines it on the page
+        self.text_editor.bind("<ButtonRelease-1>", self.on_text_click)
         
         # Setup text highlighting
         self.text_editor.tag_config("highlight", background="yellow")
@@ -82,9 +110,45 @@ class ResultDisplay:
             defaultextension=".pdf",
             filetypes=[("PDF Files", "*.pdf")]
         )
-        if path:
-            # Would need reportlab or similar PDF library installed
+        if not path:
+            return
+        image = cv2.cvtColor(self.image, cv2.COLOR_RGB2BGR)
+        if self.scheduler is None:
+            try:
+                self._write_pdf(image, path)
+            except Exception as e:
+                self._export_failed(e)
+            return
+        self.btn_export["state"] = tk.DISABLED
+        self.root.config(cursor="watch")
+        job = self.scheduler.submit(self._write_pdf, image, path, priority=1,
+                                    name=f"export PDF {os.path.basename(path)}")
+        self.root.after(self.config.progress_interval_ms, self._poll_export, job)
+
+    def _write_pdf(self, image, path):
+        # Tesseract renders the page image with an invisible text layer; edits made in the
+        # text panel are not part of it
+        outputs = OCREngine(self.config, use_cache=False).process_image_formats(image, ['pdf'])
+        write_bytes_atomic(path, outputs['pdf'])
+
+    def _poll_export(self, job):
+        if not self.root.winfo_exists():
+            return
+        if not job.finished:
+            self.root.after(self.config.progress_interval_ms, self._poll_export, job)
+            return
+        self.btn_export["state"] = tk.NORMAL
+        self.root.config(cursor="")
+        try:
+            job.wait()
+        except JobCancelled:
             pass
+        except Exception as e:
+            self._export_failed(e)
+
+    def _export_failed(self, error):
+        logging.getLogger(__name__).error(f"PDF export failed: {error}")
+        messagebox.showerror("Export PDF", f"Could not export the PDF: {error}", parent=self.root)
             
     def copy_text(self):
         self.root.clipboard_clear()
@@ -100,4 +164,39 @@ class ResultDisplay:
         end = f"{line_num + 1}.0"
         self.text_editor.tag_add("highlight", start, end)
         self.highlight_tag = (start, end)
-        self.text_editor.see(start)
\ No newline at end of file
+        self.text_editor.see(start)
+
+    def on_text_click(self, event):
+        word = self.word_at(self.text_editor.index(f"@{event.x},{event.y}"))
+        if word is not None:
+            self.sync_highlight_word(word)
+
+    def word_at(self, position):
+        """
+        Returns the index of the word at a "line.column" text position, assuming the text is
+        the words' own rendering (WordTable.text), or None.
+        """
+        if self.words is None:
+            return None
+        line, column = (int(value) for value in position.split('.'))
+        candidates = np.flatnonzero(self.words.line_numbers() == line)
+        start = 0
+        for index in candidates.tolist():
+            end = start + len(self.words.word_text(index))
+            if column <= end:
+                return index
+            start = end + 1
+        return int(candidates[-1]) if len(candidates) else None
+
+    def sync_highlight_word(self, index):
+        """
+        Highlights the text line holding a word and outlines the word's box on the image.
+        """
+        if self.words is None or not 0 <= index < len(self.words):
+            return
+        self.sync_highlight(int(self.words.line_numbers()[index]))
+        left, top, width, height = (round(int(v) / self.decode_reduction)
+                                    for v in self.words.boxes()[index])
+        image = self.image.copy()
+        cv2.rectangle(image, (left, top), (left + width, top + height), (255, 200, 0), 3)
+        self.show_image(image)
\ No newline at end of file
@@ -0,0 +1,257 @@
+import time
+import heapq
+import queue
+import logging
+import itertools
+import threading
+from collections import namedtuple
+import tracing
+
+# kind is one of queued, started, progress, retry, done, failed, cancelled
+JobEvent = namedtuple('JobEvent', ['job_id', 'name', 'kind', 'progress', 'message'])
+
+_local = threading.local()
+
+
+def current_job():
+    """
+    Returns the Job running on the calling worker thread, or None outside a job.
+    """
+    return getattr(_local, 'job', None)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """
+    A unit of work submitted to a JobScheduler.
+
+    Pending jobs are dropped when cancelled. A running job keeps going until it checks
+    job.cancelled (or calls check_cancelled) itself, so long jobs should poll between items.
+    """
+    def __init__(self, scheduler, job_id, fn, args, kwargs, priority, retries, name):
+        self.scheduler = scheduler
+        self.id = job_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.retries = retries
+        self.name = name or getattr(fn, '__name__', 'job')
+        self.state = 'pending'
+        self.queued_at = time.monotonic()
+        self.attempts = 0
+        self.result = None
+        self.error = None
+        self._cancel = threading.Event()
+        self._finished = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+        self.scheduler._cancel_pending(self)
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(self.name)
+
+    def report(self, progress=None, message=None):
+        """
+        Publishes progress (a fraction between 0 and 1) and an optional status message.
+        """
+        self.scheduler._publish(self, 'progress', progress, message)
+
+    @property
+    def finished(self):
+        return self._finished.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the job finishes and returns its result; re-raises its last error.
+        """
+        if not self._finished.wait(timeout):
+            raise TimeoutError(f"Job {self.name} did not finish within {timeout}s")
+        if self.state == 'cancelled':
+            raise JobCancelled(self.name)
+        if self.state == 'failed':
+            raise self.error
+        return self.result
+
+
+class JobScheduler:
+    """
+    Runs jobs on a bounded pool of threads in priority order, retrying failures.
+
+    Higher priorities run first and equal priorities run in submission order. A failed job is
+    re-queued up to its retries count, after retry_delay seconds. Progress and state changes
+    are published as JobEvent tuples on a queue that consumers (the Tk main loop or a headless
+    runner) drain at their own rate, so workers never touch widgets.
+    """
+    def __init__(self, workers=2, retry_delay=0.5):
+        self.workers = max(1, workers)
+        self.retry_delay = retry_delay
+        self.events = queue.Queue()
+        self._heap = []
+        self._counter = itertools.count()
+        self._ids = itertools.count(1)
+        self._condition = threading.Condition()
+        self._closed = False
+        self._running = {}
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.scheduler_workers, config.job_retry_delay)
+
+    def submit(self, fn, *args, priority=0, retries=0, name=None, **kwargs):
+        job = Job(self, next(self._ids), fn, args, kwargs, priority, retries, name)
+        self._enqueue(job)
+        self._publish(job, 'queued')
+        return job
+
+    def _enqueue(self, job):
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Scheduler is shut down")
+            heapq.heappush(self._heap, (-job.priority, next(self._counter), job))
+            self._condition.notify()
+
+    def _retry(self, job):
+        with self._condition:
+            if job.state != 'pending':
+                # Cancelled while waiting for the retry
+                return
+            if not self._closed:
+                job.queued_at = time.monotonic()
+                heapq.heappush(self._heap, (-job.priority, next(self._counter), job))
+                self._condition.notify()
+                return
+        self._finish(job, 'failed', message=str(job.error))
+
+    def _cancel_pending(self, job):
+        with self._condition:
+            if job.state != 'pending':
+                return
+            job.state = 'cancelled'
+            self._heap = [entry for entry in self._heap if entry[2] is not job]
+            heapq.heapify(self._heap)
+        self._finish(job, 'cancelled')
+
+    def cancel_all(self):
+        with self._condition:
+            jobs = [entry[2] for entry in self._heap] + list(self._running.values())
+        for job in jobs:
+            job.cancel()
+
+    def _next_job(self):
+        with self._condition:
+            while not self._heap:
+                if self._closed:
+                    return None
+                self._condition.wait()
+            job = heapq.heappop(self._heap)[2]
+            # Claimed under the lock, so cancel() cannot also finish it as pending
+            job.state = 'running'
+            self._running[job.id] = job
+            return job
+
+    def _worker(self):
+        logger = logging.getLogger(__name__)
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            job.attempts += 1
+            tracing.record('queue_wait.scheduler', time.monotonic() - job.queued_at)
+            self._publish(job, 'started')
+            _local.job = job
+            try:
+                with tracing.span('job', name=job.name):
+                    job.result = job.fn(*job.args, **job.kwargs)
+            except JobCancelled:
+                self._finish(job, 'cancelled')
+            except Exception as e:
+                job.error = e
+                if job.cancelled:
+                    self._finish(job, 'cancelled')
+                elif job.attempts <= job.retries:
+                    logger.warning(f"Job {job.name} failed (attempt {job.attempts}), retrying: {e}")
+                    with self._condition:
+                        job.state = 'pending'
+                    self._publish(job, 'retry', message=str(e))
+                    # Back off without holding a worker; the timer re-queues the job
+                    timer = threading.Timer(self.retry_delay * job.attempts, self._retry, (job,))
+                    timer.daemon = True
+                    timer.start()
+                else:
+                    logger.error(f"Job {job.name} failed after {job.attempts} attempts: {e}")
+                    self._finish(job, 'failed', message=str(e))
+            else:
+                self._finish(job, 'cancelled' if job.cancelled else 'done')
+            finally:
+                _local.job = None
+                with self._condition:
+                    self._running.pop(job.id, None)
+
+    def _finish(self, job, state, message=None):
+        job.state = state
+        job._finished.set()
+        self._publish(job, state, 1.0 if state == 'done' else None, message)
+
+    def _publish(self, job, kind, progress=None, message=None):
+        self.events.put(JobEvent(job.id, job.name, kind, progress, message))
+
+    def drain(self, max_events=None):
+        """
+        Returns the events published since the last call without blocking.
+
+        Only the newest progress event of each job is kept, so a consumer polling every
+        100 ms applies at most one update per job however many items finished meanwhile.
+        """
+        events = []
+        latest_progress = {}
+        while max_events is None or len(events) < max_events:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if event.kind == 'progress':
+                if event.job_id in latest_progress:
+                    events[latest_progress[event.job_id]] = None
+                latest_progress[event.job_id] = len(events)
+            events.append(event)
+        return [event for event in events if event is not None]
+
+    def attach_tk(self, root, callback, interval_ms=100):
+        """
+        Drains events on the Tk main loop every interval_ms and passes them to callback.
+        """
+        def poll():
+            events = self.drain()
+            if events:
+                try:
+                    callback(events)
+                except Exception as e:
+                    logging.getLogger(__name__).error(f"Job event handler failed: {e}")
+            root.after(interval_ms, poll)
+        root.after(interval_ms, poll)
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        if cancel_pending:
+            self.cancel_all()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
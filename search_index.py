@@ -0,0 +1,175 @@
+"""
+Full-text search over OCR results.
+
+Usage:
+    python -m search_index QUERY [--index PATH] [--limit 20]
+
+QUERY is a list of terms that must all match; "quoted words" match as a phrase and a
+trailing * matches a prefix, e.g.  invoice "total amount" ship*
+"""
+import os
+import re
+import time
+import sqlite3
+import argparse
+import threading
+from collections import namedtuple
+from config import Config
+
+SearchHit = namedtuple('SearchHit', ['document', 'page', 'snippet', 'score'])
+
+_QUERY_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+_WORD = re.compile(r'\w+')
+
+
+def build_match(query):
+    """
+    Translates a user query into an FTS5 MATCH expression.
+
+    Every term is quoted so punctuation and FTS5 keywords in OCR text are matched literally
+    instead of being parsed as query syntax. Returns None when the query has no words.
+    """
+    parts = []
+    for phrase, term in _QUERY_TOKEN.findall(query):
+        if phrase:
+            words = _WORD.findall(phrase)
+            if words:
+                parts.append('"' + " ".join(words) + '"')
+            continue
+        words = _WORD.findall(term)
+        if not words:
+            continue
+        # Terms like "e-mail" split into several words, which FTS5 matches as a phrase
+        part = '"' + " ".join(words) + '"'
+        if term.endswith('*'):
+            part += '*'
+        parts.append(part)
+    return " ".join(parts) or None
+
+
+class SearchIndex:
+    """
+    Persistent inverted index of OCR text in an SQLite FTS5 table, one row per document page.
+
+    Pages are added as their results arrive; re-adding a page replaces its text. Queries are
+    answered from the index's term and prefix b-trees, so their cost depends on the number of
+    matching pages rather than on the size of the collection.
+    """
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "id INTEGER PRIMARY KEY, document TEXT NOT NULL, page INTEGER NOT NULL, "
+                "indexed_at REAL NOT NULL, UNIQUE (document, page))")
+            # Prefix indexes on 2 and 3 characters keep short prefix queries off a full term scan
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS page_text USING fts5("
+                "text, tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.search_index_path)
+
+    def add(self, document, page, text):
+        """
+        Indexes the text of one page, replacing anything indexed for it before.
+        """
+        self.add_many([(document, page, text)])
+
+    def add_many(self, pages):
+        """
+        Indexes (document, page, text) tuples in a single transaction.
+        """
+        with self._lock:
+            with self._conn:
+                for document, page, text in pages:
+                    row_id = self._conn.execute(
+                        "INSERT INTO pages (document, page, indexed_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT (document, page) DO UPDATE SET indexed_at = excluded.indexed_at "
+                        "RETURNING id", (document, int(page), time.time())).fetchone()[0]
+                    self._conn.execute("DELETE FROM page_text WHERE rowid = ?", (row_id,))
+                    self._conn.execute(
+                        "INSERT INTO page_text (rowid, text) VALUES (?, ?)", (row_id, text))
+
+    def remove_document(self, document):
+        with self._lock:
+            with self._conn:
+                ids = self._conn.execute(
+                    "SELECT id FROM pages WHERE document = ?", (document,)).fetchall()
+                self._conn.executemany("DELETE FROM page_text WHERE rowid = ?", ids)
+                self._conn.execute("DELETE FROM pages WHERE document = ?", (document,))
+
+    def search(self, query, limit=20, ranked=True):
+        """
+        Returns matching pages as SearchHit tuples.
+
+        With ranked=True hits are ordered by BM25 relevance, which scores every matching page;
+        for terms found on most of a large collection, ranked=False returns the most recently
+        indexed matches instead and stops after limit pages.
+        """
+        match = build_match(query)
+        if match is None:
+            return []
+        order = "score" if ranked else "page_text.rowid DESC"
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.document, p.page, "
+                "snippet(page_text, 0, '[', ']', '...', 12), bm25(page_text) AS score "
+                "FROM page_text JOIN pages p ON p.id = page_text.rowid "
+                f"WHERE page_text MATCH ? ORDER BY {order} LIMIT ?", (match, limit)).fetchall()
+        return [SearchHit(document, page, " ".join(snippet.split()), score)
+                for document, page, snippet, score in rows]
+
+    def page_text(self, document, page):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT t.text FROM pages p JOIN page_text t ON t.rowid = p.id "
+                "WHERE p.document = ? AND p.page = ?", (document, int(page))).fetchone()
+        return row[0] if row else None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def optimize(self):
+        """
+        Merges the index b-trees; worth running after large batches.
+        """
+        with self._lock:
+            with self._conn:
+                self._conn.execute("INSERT INTO page_text (page_text) VALUES ('optimize')")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search indexed OCR results")
+    parser.add_argument("query")
+    parser.add_argument("--index", default=None, help="Index file (default: Config.search_index_path)")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--unranked", action="store_true",
+                        help="Return the most recently indexed matches without relevance ranking")
+    args = parser.parse_args(argv)
+
+    index = SearchIndex(args.index or Config().search_index_path)
+    start = time.perf_counter()
+    hits = index.search(args.query, args.limit, ranked=not args.unranked)
+    elapsed = (time.perf_counter() - start) * 1000
+    for hit in hits:
+        print(f"{hit.document} [page {hit.page + 1}]: {hit.snippet}")
+    print(f"{len(hits)} hits in {elapsed:.1f} ms ({len(index)} pages indexed)")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
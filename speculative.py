@@ -0,0 +1,104 @@
+import os
+import logging
+import threading
+from config import Config
+from ocr_engine import OCREngine
+from scheduler import JobCancelled, current_job
+import documents
+import pipeline
+
+
+class SpeculativeOCR:
+    """
+    Background OCR of pages in the state the user is most likely to submit.
+
+    Pages are OCR'd as low-priority scheduler jobs as soon as they are uploaded, and again after
+    each edit settles. Every job is tagged with the edit operations it applied; submitting a
+    page with different operations cancels its previous job, and result() only returns words
+    produced for exactly the operations asked about. A job that is already inside Tesseract
+    runs to completion, but its result is discarded as stale.
+    """
+    def __init__(self, scheduler, config: Config):
+        self.scheduler = scheduler
+        self.config = config
+        self.priority = config.speculative_priority
+        self.engine = OCREngine(config)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _version(ops):
+        return repr([(name, sorted(params.items())) for name, params in ops])
+
+    def submit(self, path, page, ops=(), image=None, reduction=1):
+        """
+        Starts OCR of a page after the edit operations ops, replayed on image (the unedited
+        page, decoded reduction times smaller than the file, or loaded from path when None).
+        Returns the job, reusing one already queued or done for the same operations. Word
+        boxes are reported in the file's pixels.
+        """
+        version = self._version(ops)
+        with self._lock:
+            previous = self._jobs.get((path, page))
+            if previous is not None:
+                if previous[0] == version and previous[1].state in ('pending', 'running', 'done'):
+                    return previous[1]
+                previous[1].cancel()
+            job = self.scheduler.submit(
+                self._run, path, page, list(ops), image, reduction, priority=self.priority,
+                name=f"speculative OCR {os.path.basename(path)} page {page + 1}")
+            self._jobs[(path, page)] = (version, job)
+        return job
+
+    def cancel(self, path, page):
+        """
+        Drops the page's job, e.g. as soon as an edit makes it stale.
+        """
+        with self._lock:
+            previous = self._jobs.pop((path, page), None)
+        if previous is not None:
+            previous[1].cancel()
+
+    def cancel_all(self):
+        with self._lock:
+            jobs, self._jobs = list(self._jobs.values()), {}
+        for _, job in jobs:
+            job.cancel()
+
+    def _run(self, path, page, ops, image, reduction):
+        job = current_job()
+        if image is None:
+            image, reduction = documents.load_page_reduced(path, page, self.config.decode_max_dpi)
+        job.check_cancelled()
+        if ops:
+            image = pipeline.Pipeline(ops).run(image)
+            job.check_cancelled()
+        words = self.engine.process_image_data(pipeline.to_gray(image), box_scale=reduction)
+        # Edited while Tesseract ran: the words no longer match the page
+        job.check_cancelled()
+        return words
+
+    def result(self, path, page, ops=()):
+        """
+        Returns the WordTable for the page after ops when a background job produced it or is
+        producing it right now (waiting for it to finish), otherwise None.
+
+        A job still queued is cancelled instead of waited for, so the caller never blocks on
+        work that needs the worker it may be occupying; it OCRs the page itself.
+        """
+        with self._lock:
+            entry = self._jobs.get((path, page))
+        if entry is None or entry[0] != self._version(ops):
+            return None
+        version, job = entry
+        if job.state == 'pending':
+            self.cancel(path, page)
+            return None
+        try:
+            return job.wait()
+        except JobCancelled:
+            return None
+        except Exception as e:
+            logging.getLogger(__name__).warning(
+                f"Speculative OCR of {path} page {page + 1} failed, running it again: {e}")
+            return None
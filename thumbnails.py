@@ -0,0 +1,50 @@
+import os
+import hashlib
+import threading
+import logging
+from PIL import Image
+
+
+def load_thumbnail(path, size=(100, 100)):
+    """
+    Decodes a small RGB version of an image file.
+
+    JPEG files are decoded in draft mode, which lets the decoder scale by 1/2 to 1/8 while
+    decompressing instead of producing the full-resolution bitmap first.
+    """
+    with Image.open(path) as img:
+        img.draft('RGB', size)
+        img.thumbnail(size)
+        return img.convert('RGB')
+
+
+class ThumbnailCache:
+    """
+    On-disk PNG thumbnails keyed by source path, modification time and file size.
+    """
+    def __init__(self, directory, size=(100, 100)):
+        self.directory = directory
+        self.size = tuple(size)
+        os.makedirs(directory, exist_ok=True)
+
+    def _cache_path(self, path):
+        stat = os.stat(path)
+        key = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{self.size}"
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + ".png")
+
+    def get(self, path):
+        """
+        Returns the cached thumbnail for a file, decoding and storing it on a miss.
+        """
+        cache_path = self._cache_path(path)
+        if os.path.isfile(cache_path):
+            try:
+                with Image.open(cache_path) as img:
+                    return img.convert('RGB')
+            except OSError as e:
+                logging.getLogger(__name__).warning(f"Discarding unreadable thumbnail {cache_path}: {e}")
+        thumbnail = load_thumbnail(path, self.size)
+        tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        thumbnail.save(tmp_path, format='PNG')
+        os.replace(tmp_path, cache_path)
+        return thumbnail
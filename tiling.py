@@ -0,0 +1,188 @@
+import os
+import copy
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from ocr_data import WordTable
+
+
+def strip_bounds(height, strip_height, overlap):
+    """
+    Splits a page into overlapping horizontal strips.
+
+    Yields (top, bottom, own_top, own_bottom): the strip rows and the rows it is responsible
+    for. Ownership ranges tile the page exactly, each boundary sitting in the middle of an
+    overlap, so a word seen by two strips is kept only by the one owning its centre.
+    """
+    if overlap >= strip_height:
+        raise ValueError("Tile overlap must be smaller than the tile height")
+    step = strip_height - overlap
+    top = 0
+    while True:
+        bottom = min(height, top + strip_height)
+        own_top = 0 if top == 0 else top + overlap // 2
+        own_bottom = height if bottom == height else bottom - overlap // 2
+        yield top, bottom, own_top, own_bottom
+        if bottom == height:
+            return
+        top += step
+
+
+class _Block:
+    def __init__(self, strip, order, words):
+        self.strip = strip
+        self.order = order
+        self.words = words
+        self.left = int(words.left.min())
+        self.top = int(words.top.min())
+        self.right = int((words.left.astype(int) + words.width).max())
+        self.bottom = int((words.top.astype(int) + words.height).max())
+
+    def text(self):
+        return self.words.text()
+
+
+def strip_blocks(words, strip_index, own_top, own_bottom):
+    """
+    Groups one strip's words (in page coordinates) into text blocks, keeping only words
+    whose centre lies in the strip's own rows.
+    """
+    centre = words.top + words.height / 2
+    words = words.select((centre >= own_top) & (centre < own_bottom))
+    blocks = []
+    for block_num in dict.fromkeys(words.block.tolist()):
+        blocks.append(_Block(strip_index, len(blocks), words.select(words.block == block_num)))
+    return blocks
+
+
+def merge_blocks(strips, boundaries, margin):
+    """
+    Orders per-strip blocks for reading and returns their word tables.
+
+    A block touching the top of its strip's own range continues the column whose last block
+    touched the bottom of the previous strip, when the two overlap horizontally. Columns are
+    then emitted in the order they first appear, which matches how the whole page reads.
+    """
+    chains = []
+    open_chains = []
+    for strip_index, blocks in enumerate(strips):
+        own_top = boundaries[strip_index][2]
+        still_open = []
+        for block in blocks:
+            chain = None
+            if block.top - own_top <= margin:
+                chain = _best_continuation(block, open_chains)
+            if chain is None:
+                chain = []
+                chains.append(chain)
+            else:
+                open_chains.remove(chain)
+            chain.append(block)
+            still_open.append(chain)
+        own_bottom = boundaries[strip_index][3]
+        open_chains = [chain for chain in still_open if own_bottom - chain[-1].bottom <= margin]
+    return [table for chain_id, chain in enumerate(chains, start=1)
+            for table in _renumber(chain, chain_id)]
+
+
+def _renumber(chain, block_id):
+    # Tesseract ids restart in every strip; give each column one block id and running
+    # paragraph/line ids so continued paragraphs stay joined and nothing else merges
+    tables = []
+    par = line = 0
+    for idx, block in enumerate(chain):
+        new_line, new_par = block.words.line_starts()
+        if idx:
+            new_par[0] = False
+        pars = par + np.cumsum(new_par)
+        lines = line + np.cumsum(new_line)
+        par, line = int(pars[-1]), int(lines[-1])
+        tables.append(block.words.with_columns(
+            block=np.full(len(lines), block_id), par=pars, line=lines))
+    return tables
+
+
+def _best_continuation(block, open_chains):
+    best, best_overlap = None, 0.6
+    for chain in open_chains:
+        tail = chain[-1]
+        overlap = min(block.right, tail.right) - max(block.left, tail.left)
+        widest = max(block.right - block.left, tail.right - tail.left, 1)
+        if overlap / widest > best_overlap:
+            best, best_overlap = chain, overlap / widest
+    return best
+
+
+def ocr_tiled(image, recognize, strip_height, overlap, workers=None):
+    """
+    OCRs a large grayscale page strip by strip in parallel and merges the words.
+
+    recognize(strip) must return a WordTable for the strip. Strips are views into the page,
+    and at most two strips per worker are in flight at once. Returns a WordTable in page
+    coordinates and reading order.
+    """
+    logger = logging.getLogger(__name__)
+    height = image.shape[0]
+    boundaries = list(strip_bounds(height, strip_height, overlap))
+    workers = workers or os.cpu_count() or 1
+    logger.info(f"Tiled OCR of {image.shape[1]}x{height} page in {len(boundaries)} strips")
+
+    strips = [None] * len(boundaries)
+
+    def collect(idx, future):
+        _, _, own_top, own_bottom = boundaries[idx]
+        words = future.result().shifted(dy=boundaries[idx][0])
+        strips[idx] = strip_blocks(words, idx, own_top, own_bottom)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tile") as pool:
+        pending = deque()
+        for idx, (top, bottom, _, _) in enumerate(boundaries):
+            pending.append((idx, pool.submit(recognize, image[top:bottom])))
+            if len(pending) >= 2 * workers:
+                collect(*pending.popleft())
+        while pending:
+            collect(*pending.popleft())
+
+    return WordTable.concat(merge_blocks(strips, boundaries, margin=overlap // 2))
+
+
+def preprocess_tiled(image, preprocess, strip_height, overlap, workers=None):
+    """
+    Runs preprocess(strip) over overlapping strips of a large page in parallel and stitches the
+    rows each strip owns into one page. preprocess must keep the strip size and only look at
+    pixels less than half the overlap away, like denoising and adaptive thresholding.
+
+    Each thread works on its own deep copy of preprocess, so scratch buffers are reused per
+    thread and never shared; at most two strips per worker are in flight at once.
+    """
+    height = image.shape[0]
+    boundaries = list(strip_bounds(height, strip_height, overlap))
+    workers = workers or os.cpu_count() or 1
+    local = threading.local()
+    page = None
+
+    def run(strip):
+        steps = getattr(local, 'steps', None)
+        if steps is None:
+            steps = local.steps = copy.deepcopy(preprocess)
+        return steps(strip)
+
+    def collect(idx, future):
+        nonlocal page
+        top, _, own_top, own_bottom = boundaries[idx]
+        strip = future.result()
+        if page is None:
+            page = np.empty((height,) + strip.shape[1:], strip.dtype)
+        page[own_top:own_bottom] = strip[own_top - top:own_bottom - top]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tile-preprocess") as pool:
+        pending = deque()
+        for idx, (top, bottom, _, _) in enumerate(boundaries):
+            pending.append((idx, pool.submit(run, image[top:bottom])))
+            if len(pending) >= 2 * workers:
+                collect(*pending.popleft())
+        while pending:
+            collect(*pending.popleft())
+    return page
@@ -0,0 +1,184 @@
+"""
+Per-stage timing for the OCR pipeline.
+
+Code wraps work in `with tracing.span("stage"):`. Every span updates an in-memory histogram
+per stage (a dictionary update under a lock, cheap enough to leave on), and when a trace file
+is configured it is also appended to a JSON-lines trace. Histograms are exported in the
+Prometheus text format with write_prometheus.
+"""
+import os
+import json
+import time
+import bisect
+import atexit
+import functools
+import threading
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Trace events buffered before they are written out
+FLUSH_EVERY = 256
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = True
+        self.trace_path = None
+        self._stats = {}
+        self._events = []
+        self._lock = threading.Lock()
+
+    def configure(self, enabled=True, trace_path=None):
+        self.flush()
+        self.enabled = enabled
+        self.trace_path = trace_path
+        if trace_path:
+            directory = os.path.dirname(trace_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+    def reset(self):
+        """
+        Drops all statistics and unwritten events, e.g. those a forked worker inherited.
+        """
+        with self._lock:
+            self._stats = {}
+            self._events = []
+
+    @contextmanager
+    def span(self, stage, **attrs):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, **attrs)
+
+    def record(self, stage, seconds, **attrs):
+        """
+        Adds one measured duration for a stage, e.g. a queue wait timed elsewhere.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._stats.get(stage)
+            if stats is None:
+                stats = self._stats[stage] = [0, 0.0, 0.0, [0] * (len(BUCKETS) + 1)]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            stats[3][bisect.bisect_left(BUCKETS, seconds)] += 1
+            if self.trace_path:
+                self._events.append(
+                    (time.time(), stage, seconds, threading.current_thread().name, attrs))
+                if len(self._events) >= FLUSH_EVERY:
+                    self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._events or not self.trace_path:
+            self._events = []
+            return
+        pid = os.getpid()
+        lines = "".join(
+            json.dumps({'ts': round(ts, 6), 'stage': stage, 'ms': round(seconds * 1000, 3),
+                        'pid': pid, 'thread': thread, **attrs}, default=str) + "\n"
+            for ts, stage, seconds, thread, attrs in self._events)
+        self._events = []
+        # One append per flush keeps lines from several worker processes intact
+        with open(self.trace_path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+    def snapshot(self, reset=False):
+        """
+        Returns the per-stage statistics as plain data, e.g. to ship them out of a worker process.
+        """
+        with self._lock:
+            snapshot = {stage: [s[0], s[1], s[2], list(s[3])] for stage, s in self._stats.items()}
+            if reset:
+                self._stats = {}
+        return snapshot
+
+    def merge(self, snapshot):
+        with self._lock:
+            for stage, (count, total, peak, buckets) in snapshot.items():
+                stats = self._stats.get(stage)
+                if stats is None:
+                    self._stats[stage] = [count, total, peak, list(buckets)]
+                    continue
+                stats[0] += count
+                stats[1] += total
+                stats[2] = max(stats[2], peak)
+                stats[3] = [a + b for a, b in zip(stats[3], buckets)]
+
+    def summary(self):
+        """
+        Returns (stage, count, total seconds, mean ms, max ms) rows, most total time first.
+        """
+        rows = [(stage, s[0], s[1], s[1] / s[0] * 1000, s[2] * 1000)
+                for stage, s in self.snapshot().items()]
+        return sorted(rows, key=lambda row: -row[2])
+
+    def format_summary(self):
+        lines = [f"{'stage':32s} {'count':>8s} {'total s':>10s} {'mean ms':>10s} {'max ms':>10s}"]
+        for stage, count, total, mean, peak in self.summary():
+            lines.append(f"{stage:32s} {count:8d} {total:10.3f} {mean:10.2f} {peak:10.2f}")
+        return "\n".join(lines)
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP ocr_stage_seconds Time spent per pipeline stage.",
+            "# TYPE ocr_stage_seconds histogram",
+        ]
+        for stage, (count, total, _, buckets) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, hits in zip(BUCKETS, buckets):
+                cumulative += hits
+                lines.append(f'ocr_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'ocr_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'ocr_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'ocr_stage_seconds_count{{stage="{stage}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        Writes the histograms in the Prometheus text exposition format, e.g. for the node
+        exporter's textfile collector. The file is replaced atomically.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+tracer = Tracer()
+span = tracer.span
+record = tracer.record
+atexit.register(tracer.flush)
+
+
+def configure(config):
+    tracer.configure(config.tracing_enabled, config.trace_path)
+
+
+def traced(stage):
+    """
+    Decorator form of span().
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
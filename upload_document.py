@@ -1,15 +1,29 @@
 import os
 import tkinter as tk
 from tkinter import ttk, filedialog
-from PIL import Image, ImageTk
+from PIL import ImageTk
 import threading
+import queue
 import cv2
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from thumbnails import ThumbnailCache
 
 class UploadPanel:
-    def __init__(self, parent):
+    def __init__(self, parent, config=None, on_files_added=None):
         self.parent = parent
+        self.config = config or Config()
+        # Called with the newly accepted paths, e.g. to start OCR before it is asked for
+        self.on_files_added = on_files_added
         self.frame = ttk.Frame(parent)
+        self.thumbnail_cache = ThumbnailCache(self.config.thumbnail_cache_path,
+                                              self.config.thumbnail_size)
+        self.thumbnail_pool = ThreadPoolExecutor(max_workers=self.config.thumbnail_workers,
+                                                 thread_name_prefix="thumbnail")
+        self.thumbnail_queue = queue.Queue()
+        self.thumbnails = []
+        self.thumbnail_pending = 0
         self.setup_ui()
 
     def setup_ui(self):
@@ -27,12 +41,15 @@ class UploadPanel:
         self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.canvas.yview)
         self.thumbnail_frame = ttk.Frame(self.canvas)
         
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.canvas.configure(yscrollcommand=self.on_canvas_scroll)
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
         self.canvas.create_window((0,0), window=self.thumbnail_frame, anchor=tk.NW)
         self.thumbnail_frame.bind("<Configure>", self.on_frame_configure)
+        self.canvas.bind("<Configure>", lambda event: self.load_visible_thumbnails())
+        self.placeholder = tk.PhotoImage(width=self.config.thumbnail_size[0],
+                                         height=self.config.thumbnail_size[1])
 
 
     def setup_upload_ui(self):
@@ -47,42 +64,93 @@ class UploadPanel:
 
     def on_frame_configure(self, event):
         self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        self.load_visible_thumbnails()
+
+    def on_canvas_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.load_visible_thumbnails()
 
     def select_files(self):
         filetypes = (
-            ('Image files', '*.png *.jpg *.jpeg *.tiff'),
+            ('Image files', '*.png *.jpg *.jpeg *.tif *.tiff'),
             ('All files', '*.*')
         )
         filenames = filedialog.askopenfilenames(
             title='Select documents',
             filetypes=filetypes
         )
+        added = []
         for f in filenames:
             if self.validate_file(f):
                 self.file_listbox.insert(tk.END, f)
                 self.add_thumbnail(f)
+                added.append(f)
+        if added and self.on_files_added is not None:
+            self.on_files_added(added)
 
     def validate_file(self, path):
-        if os.path.getsize(path) > 10*1024*1024:  # 10MB limit
+        # Large scans are accepted; OCREngine switches to tiled processing for oversized pages
+        limit = self.config.max_upload_bytes
+        if limit is not None and os.path.getsize(path) > limit:
             logging.error("File too large")
             return False
-        return path.lower().endswith(('.png', '.jpg', '.jpeg'))
+        return path.lower().endswith(('.png', '.jpg', '.jpeg', '.tif', '.tiff'))
 
     def clear_files(self):
         self.file_listbox.delete(0, tk.END)
+        self.thumbnails = []
         for widget in self.thumbnail_frame.winfo_children():
             widget.destroy()
 
     def add_thumbnail(self, image_source):
+        # Show a placeholder now; the image is decoded off the Tk thread once it scrolls into view
         thumbnail = ttk.Frame(self.thumbnail_frame)
         thumbnail.pack(side=tk.TOP, padx=2, pady=2)
-        if isinstance(image_source, str):  # File path
-            img = Image.open(image_source)
-        img.thumbnail((100, 100))
-        photo = ImageTk.PhotoImage(img)
-        
-        label = ttk.Label(thumbnail, image=photo)
-        label.image = photo
+        label = ttk.Label(thumbnail, image=self.placeholder)
         label.pack(side=tk.LEFT)
-        
-        ttk.Label(thumbnail, text=os.path.basename(image_source)).pack(side=tk.LEFT)
\ No newline at end of file
+        ttk.Label(thumbnail, text=os.path.basename(image_source)).pack(side=tk.LEFT)
+        self.thumbnails.append({'path': image_source, 'frame': thumbnail, 'label': label,
+                                'requested': False})
+        self.frame.after_idle(self.load_visible_thumbnails)
+
+    def load_visible_thumbnails(self):
+        """
+        Queues decoding for thumbnails inside (or one screen below) the visible canvas area.
+        """
+        top = self.canvas.canvasy(0)
+        height = self.canvas.winfo_height()
+        bottom = top + 2 * height
+        for entry in self.thumbnails:
+            if entry['requested']:
+                continue
+            y = entry['frame'].winfo_y()
+            if y > bottom:
+                break
+            if y + entry['frame'].winfo_height() < top:
+                continue
+            entry['requested'] = True
+            future = self.thumbnail_pool.submit(self.thumbnail_cache.get, entry['path'])
+            future.add_done_callback(lambda f, entry=entry: self.thumbnail_queue.put((entry, f)))
+            if self.thumbnail_pending == 0:
+                self.frame.after(50, self.drain_thumbnails)
+            self.thumbnail_pending += 1
+
+    def drain_thumbnails(self):
+        # PhotoImage must be created on the Tk thread, so workers hand results back through a queue
+        while True:
+            try:
+                entry, future = self.thumbnail_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.thumbnail_pending -= 1
+            if not entry['label'].winfo_exists():
+                continue
+            try:
+                photo = ImageTk.PhotoImage(future.result())
+            except Exception as e:
+                logging.error(f"Thumbnail failed for {entry['path']}: {e}")
+                continue
+            entry['label'].configure(image=photo)
+            entry['label'].image = photo
+        if self.thumbnail_pending > 0:
+            self.frame.after(50, self.drain_thumbnails)
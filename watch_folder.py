@@ -0,0 +1,250 @@
+"""
+Watch-folder daemon: OCR every document that appears in Config.input_path and write one
+.txt per page to Config.output_path. Progress is kept in a manifest in the output folder,
+so a restart resumes with the pages that were not finished.
+
+Usage:
+    python -m watch_folder [--input DIR] [--output DIR] [--interval SEC] [--once]
+                           [--rotate DEG] [--deskew] [--auto] [--workers N] ...
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import logging
+from atomic_write import write_text_atomic
+from batch_ocr import (add_processing_arguments, build_pipeline, config_from_args,
+                       export_timings, output_path_for)
+from ocr_engine import OCREngine
+from search_index import SearchIndex
+import documents
+import pipeline
+import tracing
+
+MANIFEST_NAME = ".manifest.sqlite3"
+
+
+class Manifest:
+    """
+    On-disk record of every input document and the state of each of its pages.
+
+    A document is identified by its path, modification time and size; when any of them
+    changes its pages are reset and processed again. Pages move from pending to done, or to
+    failed after too many attempts.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "document TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, "
+                "page_count INTEGER NOT NULL)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "document TEXT NOT NULL, page INTEGER NOT NULL, status TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, output TEXT, error TEXT, "
+                "updated REAL NOT NULL, PRIMARY KEY (document, page))")
+
+    def is_current(self, document, mtime_ns, size):
+        row = self._conn.execute(
+            "SELECT mtime_ns, size FROM documents WHERE document = ?", (document,)).fetchone()
+        return row is not None and tuple(row) == (mtime_ns, size)
+
+    def add_document(self, document, mtime_ns, size, page_count):
+        """
+        Registers a new or changed document with all its pages pending.
+        """
+        now = time.time()
+        with self._conn:
+            self._conn.execute("DELETE FROM pages WHERE document = ?", (document,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?)",
+                (document, mtime_ns, size, page_count))
+            self._conn.executemany(
+                "INSERT INTO pages (document, page, status, updated) VALUES (?, ?, 'pending', ?)",
+                [(document, page, now) for page in range(page_count)])
+
+    def pending_pages(self, max_attempts):
+        rows = self._conn.execute(
+            "SELECT p.document, p.page, d.page_count FROM pages p "
+            "JOIN documents d ON d.document = p.document "
+            "WHERE p.status = 'pending' AND p.attempts < ? ORDER BY p.document, p.page",
+            (max_attempts,)).fetchall()
+        return [documents.PageRef(*row) for row in rows]
+
+    def mark_done(self, document, page, output):
+        with self._conn:
+            self._conn.execute(
+                "UPDATE pages SET status = 'done', output = ?, error = NULL, "
+                "attempts = attempts + 1, updated = ? WHERE document = ? AND page = ?",
+                (output, time.time(), document, page))
+
+    def mark_failed(self, document, page, error, max_attempts):
+        with self._conn:
+            self._conn.execute(
+                "UPDATE pages SET attempts = attempts + 1, error = ?, updated = ?, "
+                "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END "
+                "WHERE document = ? AND page = ?",
+                (error, time.time(), max_attempts, document, page))
+
+    def counts(self):
+        return dict(self._conn.execute("SELECT status, COUNT(*) FROM pages GROUP BY status"))
+
+    def close(self):
+        self._conn.close()
+
+
+class WatchFolder:
+    """
+    Polls an input folder and feeds new pages through preprocessing and OCR.
+
+    A file is picked up once its size and modification time are unchanged between two scans,
+    so documents still being copied in are left alone. Pending pages are OCR'd on the
+    OCREngine.process_batch worker pool, and each result is written atomically before the
+    manifest marks the page done.
+    """
+    def __init__(self, config, steps, workers=None, chunk_size=None):
+        self.config = config
+        self.steps = steps
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.input_dir = config.input_path
+        self.output_dir = config.output_path
+        os.makedirs(self.input_dir, exist_ok=True)
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.manifest = Manifest(os.path.join(self.output_dir, MANIFEST_NAME))
+        self.ocr_engine = OCREngine(config)
+        self.index = SearchIndex.from_config(config) if config.search_index_path else None
+        self._last_seen = {}
+
+    def scan(self, wait_stable=True):
+        """
+        Registers documents that are new or changed since they were last processed.
+        Returns how many were added.
+        """
+        logger = logging.getLogger(__name__)
+        seen = {}
+        added = 0
+        for path in pipeline.iter_image_files(self.input_dir, recursive=True):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature = (stat.st_mtime_ns, stat.st_size)
+            seen[path] = signature
+            if self.manifest.is_current(path, *signature):
+                continue
+            if wait_stable and self._last_seen.get(path) != signature:
+                # Still being written, or first seen in this scan
+                continue
+            try:
+                count = documents.page_count(path)
+            except OSError as e:
+                logger.warning(f"Skipping unreadable document {path}: {e}")
+                continue
+            self.manifest.add_document(path, *signature, count)
+            logger.info(f"Queued {path} ({count} pages)")
+            added += 1
+        self._last_seen = seen
+        return added
+
+    def process_pending(self):
+        """
+        OCRs every pending page and returns (done, failed) counts for this pass.
+        """
+        logger = logging.getLogger(__name__)
+        refs = self.manifest.pending_pages(self.config.watch_max_attempts)
+        if not refs:
+            return 0, 0
+        logger.info(f"Processing {len(refs)} pages")
+        done = failed = 0
+        results = self.ocr_engine.process_batch(
+            refs, workers=self.workers, ordered=False, preprocess=self.steps,
+            chunk_size=self.chunk_size)
+        for index, text in results:
+            ref = refs[index]
+            if text is None:
+                self.manifest.mark_failed(ref.document, ref.page, "OCR failed",
+                                          self.config.watch_max_attempts)
+                failed += 1
+                continue
+            out_path = output_path_for(ref.document, self.input_dir, self.output_dir,
+                                       ref.page, ref.page_count)
+            try:
+                with tracing.span('result'):
+                    write_text_atomic(out_path, text)
+            except OSError as e:
+                logger.error(f"Could not write result for {ref.document} page {ref.page}: {e}")
+                self.manifest.mark_failed(ref.document, ref.page, str(e),
+                                          self.config.watch_max_attempts)
+                failed += 1
+                continue
+            with tracing.span('result'):
+                self.manifest.mark_done(ref.document, ref.page, out_path)
+                if self.index is not None:
+                    self.index.add(os.path.abspath(ref.document), ref.page, text)
+            done += 1
+        logger.info(f"Pass finished: {done} pages done, {failed} failed, manifest {self.manifest.counts()}")
+        return done, failed
+
+    def run(self, interval=None, once=False):
+        """
+        Scans and processes until interrupted. With once=True, processes what is in the
+        folder now (including interrupted work) and returns.
+        """
+        interval = self.config.watch_interval if interval is None else interval
+        if once:
+            # A one-off run takes the folder as it is instead of waiting for a second scan
+            self.scan(wait_stable=False)
+            self.process_pending()
+            return
+        while True:
+            self.scan()
+            self.process_pending()
+            time.sleep(interval)
+
+    def close(self):
+        self.manifest.close()
+        if self.index is not None:
+            self.index.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Watch a folder and OCR new documents as they arrive")
+    parser.add_argument("--input", default=None, help="Folder to watch (default: Config.input_path)")
+    parser.add_argument("--output", default=None, help="Folder for results (default: Config.output_path)")
+    parser.add_argument("--interval", type=float, default=None,
+                        help="Seconds between scans (default: Config.watch_interval)")
+    parser.add_argument("--once", action="store_true",
+                        help="Process what is in the folder now, then exit")
+    add_processing_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    config = config_from_args(args)
+    if args.input:
+        config.input_path = args.input
+    if args.output:
+        config.output_path = args.output
+    watcher = WatchFolder(config, build_pipeline(args, config), args.workers, args.chunk_size)
+    try:
+        watcher.run(args.interval, once=args.once)
+    except KeyboardInterrupt:
+        logging.getLogger(__name__).warning(
+            f"Stopped; unfinished pages resume on the next start ({watcher.manifest.counts()})")
+    finally:
+        watcher.close()
+        export_timings(config)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())